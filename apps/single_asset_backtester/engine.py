@@ -4,16 +4,26 @@
 from ast import List
 import importlib
 import traceback
+import os
+import pickle
+import zlib
+from hashlib import sha1
 from datetime import datetime, date, timedelta
-from threading import Thread
+from threading import Thread, Event as ThreadEvent
+from queue import Queue, Empty, Full
+from multiprocessing.shared_memory import SharedMemory
+from concurrent.futures import ProcessPoolExecutor
+from math import isfinite
 from pathlib import Path
 from inspect import getfile
 from glob import glob
 from types import ModuleType
-from typing import Optional, Type, Dict, Callable, List
+from typing import Optional, Type, Dict, Callable, Iterator, List, Tuple
 from collections import defaultdict
+from itertools import islice
+from heapq import heapify, heappop, heappush
 import numpy as np
-from pandas import Series, DataFrame
+from pandas import DataFrame
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from functools import lru_cache, partial
@@ -41,15 +51,35 @@ from trader.object import (
     TradeData,
     StopOrder
 )
-from trader.utility import extract_vt_symbol, round_to
+from trader.utility import (
+    extract_vt_symbol,
+    round_to,
+    get_folder_path,
+    get_file_path,
+    indicator_cache
+)
+from trader.history import (
+    BaseHistory,
+    BarHistory,
+    TickHistory,
+    HistoryHandle,
+    EPOCH_ORDINAL,
+    attach_history
+)
 from optimizer.optimize import (
     OptimizationSetting,
+    OptimizationPool,
+    OptimizationMonitor,
+    ResultStore,
+    PRUNED_VALUE,
     check_optimization_setting,
     run_bf_optimization,
-    run_ga_optimization
+    run_ga_optimization,
+    run_bayes_optimization,
+    run_halving_optimization
 )
 from data.datafeed.datafeed import BaseDatafeed, get_datafeed
-from data.database.database import BaseDatabase, get_database
+from data.database.database import DB_TZ, BaseDatabase, get_database
 
 import strategies
 from strategies import CtaTemplate, TargetPosTemplate
@@ -60,6 +90,7 @@ APP_NAME = "SingleAssetBacktester"
 EVENT_BACKTESTER_LOG = "eBacktesterLog"
 EVENT_BACKTESTER_BACKTESTING_FINISHED = "eBacktesterBacktestingFinished"
 EVENT_BACKTESTER_OPTIMIZATION_FINISHED = "eBacktesterOptimizationFinished"
+EVENT_BACKTESTER_OPTIMIZATION_PROGRESS = "eBacktesterOptimizationProgress"
 
 STOPORDER_PREFIX = "STOP"
 
@@ -87,6 +118,20 @@ class BacktesterEngine(BaseEngine):
         # Optimization result
         self.result_values: list = None
 
+        # Look up on-disk cache before running bar backtesting. Cache key
+        # needs fingerprint of all history data, so data is loaded up front
+        # and background prefetch is only used when cache is disabled.
+        self.use_cache: bool = True
+
+        # Warm worker pool reused across optimization runs
+        self.optimization_pool: OptimizationPool = None
+
+        # Progress and cancel flag of running optimization
+        self.optimization_monitor: OptimizationMonitor = None
+
+        # Local store of optimization results for resuming and reviewing runs
+        self.result_store_filename: str = "optimization_result.db"
+
     def init_engine(self) -> None:
         """"""
         self.write_log("初始化CTA回测引擎")
@@ -160,8 +205,19 @@ class BacktesterEngine(BaseEngine):
             msg: str = f"策略文件{module_name}加载失败，触发异常：\n{traceback.format_exc()}"
             self.write_log(msg)
 
+    def close(self) -> None:
+        """"""
+        if self.optimization_pool:
+            self.optimization_pool.shutdown()
+            self.optimization_pool = None
+
     def reload_strategy_class(self) -> None:
         """"""
+        # Workers still hold old strategy code, start new ones on next optimization
+        if self.optimization_pool:
+            self.optimization_pool.shutdown()
+            self.optimization_pool = None
+
         self.classes.clear()
         self.load_strategy_class()
         self.write_log("策略文件重载刷新完成")
@@ -215,13 +271,39 @@ class BacktesterEngine(BaseEngine):
             setting
         )
 
-        engine.load_data()
-        if not engine.history_data:
-            self.write_log("策略回测失败，历史数据为空")
-            return
+        # Tick data is streamed from database during replay to bound memory usage
+        stream: bool = mode == BacktestingMode.TICK
+
+        # Bar data is loaded first so that cached result can be looked up,
+        # overlapping load with replay by prefetch is used only when cache
+        # is disabled, since the key cannot be known before loading finishes
+        key: str = ""
+        if not stream and self.use_cache:
+            engine.load_data()
+            if not engine.history_data:
+                self.write_log("策略回测失败，历史数据为空")
+                self.thread = None
+                return
+
+            key = engine.get_result_key(engine.history_data.get_fingerprint())
+            result: Optional[dict] = result_cache.get(key)
+            if result:
+                engine.set_result(result)
+                self.result_df = engine.daily_df
+                self.result_statistics = engine.calculate_statistics(output=False)
+
+                self.write_log("使用缓存的回测结果")
+                self.thread = None
+
+                event: Event = Event(EVENT_BACKTESTER_BACKTESTING_FINISHED)
+                self.event_engine.put(event)
+                return
 
         try:
-            engine.run_backtesting()
+            engine.run_backtesting(
+                stream=stream,
+                prefetch=not stream and not self.use_cache
+            )
         except Exception:
             msg: str = f"策略回测失败，触发异常：\n{traceback.format_exc()}"
             self.write_log(msg)
@@ -229,9 +311,17 @@ class BacktesterEngine(BaseEngine):
             self.thread = None
             return
 
+        if not engine.daily_closes:
+            self.write_log("策略回测失败，历史数据为空")
+            self.thread = None
+            return
+
         self.result_df = engine.calculate_result()
         self.result_statistics = engine.calculate_statistics(output=False)
 
+        if key:
+            result_cache.put(key, engine.get_result(self.result_statistics))
+
         # Clear thread object handler.
         self.thread = None
 
@@ -290,6 +380,27 @@ class BacktesterEngine(BaseEngine):
         """"""
         return self.result_values
 
+    def get_optimization_runs(self) -> List[dict]:
+        """
+        Return optimization runs saved in result store.
+        """
+        store: ResultStore = ResultStore(get_file_path(self.result_store_filename))
+        runs: List[dict] = store.get_runs()
+        store.close()
+        return runs
+
+    def load_optimization_result(self, run_id: str) -> list:
+        """
+        Load results of stored optimization run without recomputing.
+        """
+        store: ResultStore = ResultStore(get_file_path(self.result_store_filename))
+        results: list = store.load_results(run_id)
+        store.close()
+
+        results.sort(reverse=True, key=get_target_value)
+        self.result_values = results
+        return results
+
     def get_default_setting(self, class_name: str) -> dict:
         """"""
         strategy_class: type = self.classes[class_name]
@@ -308,7 +419,7 @@ class BacktesterEngine(BaseEngine):
         pricetick: float,
         capital: int,
         optimization_setting: OptimizationSetting,
-        use_ga: bool,
+        algorithm: str,
         max_workers: int
     ) -> None:
         """"""
@@ -345,27 +456,88 @@ class BacktesterEngine(BaseEngine):
         if max_workers == 0:
             max_workers = None
 
-        if use_ga:
-            self.result_values = engine.run_ga_optimization(
-                optimization_setting,
-                output=False,
-                max_workers=max_workers
-            )
+        # Worker processes import engine and strategy modules once when started
+        if not self.optimization_pool:
+            modules: List[str] = [__name__] + sorted({c.__module__ for c in self.classes.values()})
+            self.optimization_pool = OptimizationPool(modules)
+        executor: ProcessPoolExecutor = self.optimization_pool.get_executor(max_workers)
+
+        # Progress is put as event periodically until finished or stopped
+        self.optimization_monitor = OptimizationMonitor(self.put_optimization_progress)
+
+        # Every result is saved once finished, rerun of same task resumes from store
+        store: ResultStore = ResultStore(get_file_path(self.result_store_filename))
+        try:
+            if algorithm == "ga":
+                self.result_values = engine.run_ga_optimization(
+                    optimization_setting,
+                    output=False,
+                    max_workers=max_workers,
+                    executor=executor,
+                    store=store,
+                    monitor=self.optimization_monitor
+                )
+            elif algorithm == "bayes":
+                self.result_values = engine.run_bayes_optimization(
+                    optimization_setting,
+                    output=False,
+                    max_workers=max_workers,
+                    executor=executor,
+                    store=store,
+                    monitor=self.optimization_monitor
+                )
+            elif algorithm == "halving":
+                self.result_values = engine.run_halving_optimization(
+                    optimization_setting,
+                    output=False,
+                    max_workers=max_workers,
+                    executor=executor,
+                    store=store,
+                    monitor=self.optimization_monitor
+                )
+            else:
+                self.result_values = engine.run_bf_optimization(
+                    optimization_setting,
+                    output=False,
+                    max_workers=max_workers,
+                    executor=executor,
+                    store=store,
+                    monitor=self.optimization_monitor
+                )
+        finally:
+            store.close()
+
+        # Shut down workers so that evaluations still queued are dropped
+        if self.optimization_monitor.stopped:
+            self.optimization_pool.shutdown()
+            self.write_log("多进程参数优化已停止")
         else:
-            self.result_values = engine.run_bf_optimization(
-                optimization_setting,
-                output=False,
-                max_workers=max_workers
-            )
+            self.write_log("多进程参数优化完成")
 
         # Clear thread object handler.
         self.thread = None
-        self.write_log("多进程参数优化完成")
+        self.optimization_monitor = None
 
         # Put optimization done event
         event: Event = Event(EVENT_BACKTESTER_OPTIMIZATION_FINISHED)
         self.event_engine.put(event)
 
+    def stop_optimization(self) -> bool:
+        """
+        Stop running optimization, results finished so far are kept.
+        """
+        if not self.optimization_monitor:
+            return False
+
+        self.optimization_monitor.stop()
+        self.write_log("正在停止参数优化，等待运行中的回测完成")
+        return True
+
+    def put_optimization_progress(self, progress: dict) -> None:
+        """"""
+        event: Event = Event(EVENT_BACKTESTER_OPTIMIZATION_PROGRESS, progress)
+        self.event_engine.put(event)
+
     def start_optimization(
         self,
         class_name: str,
@@ -379,7 +551,7 @@ class BacktesterEngine(BaseEngine):
         pricetick: float,
         capital: int,
         optimization_setting: OptimizationSetting,
-        use_ga: bool,
+        algorithm: str,
         max_workers: int
     ) -> bool:
         if self.thread:
@@ -401,7 +573,7 @@ class BacktesterEngine(BaseEngine):
                 pricetick,
                 capital,
                 optimization_setting,
-                use_ga,
+                algorithm,
                 max_workers
             )
         )
@@ -506,7 +678,7 @@ class BacktesterEngine(BaseEngine):
 
     def get_history_data(self) -> list:
         """"""
-        return self.backtesting_engine.history_data
+        return list(self.backtesting_engine.history_data)
 
     def get_strategy_class_file(self, class_name: str) -> str:
         """"""
@@ -538,6 +710,7 @@ class BacktestingEngine:
         self.mode: BacktestingMode = BacktestingMode.BAR
 
         self.strategy_class: Type[CtaTemplate] = None
+        self.strategy_setting: dict = {}
         self.strategy: CtaTemplate = None
         self.tick: TickData
         self.bar: BarData
@@ -546,24 +719,42 @@ class BacktestingEngine:
         self.interval: Interval = None
         self.days: int = 0
         self.callback: Callable = None
-        self.history_data: list = []
+        self.history_data: BaseHistory = BarHistory("", None, None)
 
         self.stop_order_count: int = 0
         self.stop_orders: Dict[str, StopOrder] = {}
         self.active_stop_orders: Dict[str, StopOrder] = {}
+        self.long_stop_heap: OrderHeap = OrderHeap(self.active_stop_orders, False)
+        self.short_stop_heap: OrderHeap = OrderHeap(self.active_stop_orders, True)
 
         self.limit_order_count: int = 0
         self.limit_orders: Dict[str, OrderData] = {}
         self.active_limit_orders: Dict[str, OrderData] = {}
+        self.long_limit_heap: OrderHeap = OrderHeap(self.active_limit_orders, True)
+        self.short_limit_heap: OrderHeap = OrderHeap(self.active_limit_orders, False)
+        self.submitting_orders: List[Tuple[int, OrderData]] = []
 
         self.trade_count: int = 0
         self.trades: Dict[str, TradeData] = {}
 
         self.logs: list = []
 
-        self.daily_results: Dict[date, DailyResult] = {}
+        self.daily_closes: Dict[date, float] = {}
+        self.daily_arrays: Dict[str, np.ndarray] = None
         self.daily_df: DataFrame = None
 
+        # Optimization evaluations and batch runs use on-disk result cache
+        # only if enabled, since it hashes history data and writes trades
+        self.use_cache: bool = False
+
+        # Pruning rules and running equity state for checking them
+        self.prune_rules: dict = {}
+        self.pruned: str = ""
+        self.prune_trade_count: int = 0
+        self.prune_pos: float = 0
+        self.prune_cash: float = 0
+        self.prune_peak: float = 0
+
     def clear_data(self) -> None:
         """
         Clear all data of last backtesting.
@@ -576,16 +767,29 @@ class BacktestingEngine:
         self.stop_order_count = 0
         self.stop_orders.clear()
         self.active_stop_orders.clear()
+        self.long_stop_heap.clear()
+        self.short_stop_heap.clear()
 
         self.limit_order_count = 0
         self.limit_orders.clear()
         self.active_limit_orders.clear()
+        self.long_limit_heap.clear()
+        self.short_limit_heap.clear()
+        self.submitting_orders.clear()
 
         self.trade_count = 0
         self.trades.clear()
 
         self.logs.clear()
-        self.daily_results.clear()
+        self.daily_closes.clear()
+        self.daily_arrays = None
+        self.daily_df = None
+
+        self.pruned = ""
+        self.prune_trade_count = 0
+        self.prune_pos = 0
+        self.prune_cash = 0
+        self.prune_peak = 0
 
     def set_parameters(
         self,
@@ -628,12 +832,109 @@ class BacktestingEngine:
     def add_strategy(self, strategy_class: Type[CtaTemplate], setting: dict) -> None:
         """"""
         self.strategy_class = strategy_class
+        self.strategy_setting = setting
         self.strategy = strategy_class(
             self, strategy_class.__name__, self.vt_symbol, setting
         )
 
     def load_data(self) -> None:
         """"""
+        histories: List[BaseHistory] = list(self.iter_history_windows())
+        if not histories:
+            return
+
+        # Merge all loaded history into one columnar container
+        self.history_data = histories[0].concatenate(histories)
+
+        self.output(f"历史数据加载完成，数据量：{len(self.history_data)}")
+
+    def get_result_key(self, fingerprint: str, vectorized: bool = False) -> str:
+        """
+        Return cache key of backtesting result with strategy code, parameters
+        and history data fingerprint.
+        """
+        file_path: str = getfile(self.strategy_class)
+        code_hash: str = get_code_hash(file_path, os.path.getmtime(file_path))
+
+        parameters: tuple = (
+            self.strategy_class.__name__,
+            sorted(self.strategy_setting.items()),
+            self.vt_symbol,
+            self.interval.value,
+            self.start,
+            self.end,
+            self.rate,
+            self.slippage,
+            self.size,
+            self.pricetick,
+            self.capital,
+            self.mode.value,
+            self.risk_free,
+            self.annual_days,
+            vectorized,
+        )
+        return sha1(f"{code_hash}|{parameters!r}|{fingerprint}".encode()).hexdigest()
+
+    def get_result(self, statistics: dict) -> dict:
+        """
+        Return result of last backtesting for caching.
+        """
+        return {
+            "statistics": statistics,
+            "daily": self.daily_arrays,
+            "trades": list(self.trades.values()),
+        }
+
+    def set_result(self, result: dict) -> None:
+        """
+        Restore trades and daily result from cached result.
+        """
+        self.trades = {trade.vt_tradeid: trade for trade in result["trades"]}
+        self.trade_count = len(self.trades)
+
+        self.daily_arrays = result["daily"]
+        self.daily_df = DataFrame.from_dict(self.daily_arrays).set_index("date")
+
+    def set_history_data(self, history: BaseHistory) -> None:
+        """
+        Use given history data directly instead of loading from database.
+        """
+        self.history_data = history
+
+    def share_history_data(self) -> Tuple[Optional[SharedMemory], Optional[HistoryHandle]]:
+        """
+        Load history data once and copy it into shared memory for worker processes.
+        """
+        self.load_data()
+        if not self.history_data:
+            return None, None
+
+        return self.history_data.share()
+
+    def set_indicator_source(self, fingerprint: str) -> None:
+        """
+        Use bar history data as source of indicator cache, so that indicator
+        series are shared by backtesting of different settings in this process.
+        """
+        history: BaseHistory = self.history_data
+        if not isinstance(history, BarHistory) or not len(history):
+            indicator_cache.clear_source()
+            return
+
+        indicator_cache.set_source(fingerprint, {
+            "open": history.open_price,
+            "high": history.high_price,
+            "low": history.low_price,
+            "close": history.close_price,
+            "volume": history.volume,
+            "turnover": history.turnover,
+            "open_interest": history.open_interest,
+        })
+
+    def iter_history_windows(self) -> Iterator[BaseHistory]:
+        """
+        Load history data window by window with progress update.
+        """
         self.output("开始加载历史数据")
 
         if not self.end:
@@ -643,8 +944,6 @@ class BacktestingEngine:
             self.output("起始日期必须小于结束日期")
             return
 
-        self.history_data.clear()       # Clear previously loaded history data
-
         # Load 30 days of data each time and allow for progress update
         total_days: int = (self.end - self.start).days
         progress_days: int = max(int(total_days / 10), 1)
@@ -662,7 +961,7 @@ class BacktestingEngine:
             end: datetime = min(end, self.end)  # Make sure end time stays within set range
 
             if self.mode == BacktestingMode.BAR:
-                data: List[BarData] = load_bar_data(
+                data: BarHistory = load_bar_history(
                     self.symbol,
                     self.exchange,
                     self.interval,
@@ -670,14 +969,14 @@ class BacktestingEngine:
                     end
                 )
             else:
-                data: List[TickData] = load_tick_data(
+                data: TickHistory = load_tick_history(
                     self.symbol,
                     self.exchange,
                     start,
                     end
                 )
 
-            self.history_data.extend(data)
+            yield data
 
             progress += progress_days / total_days
             progress = min(progress, 1)
@@ -685,10 +984,73 @@ class BacktestingEngine:
             start = end + interval_delta
             end += progress_delta
 
-        self.output(f"历史数据加载完成，数据量：{len(self.history_data)}")
+    def prefetch_history_data(self, queue_size: int = 2) -> Iterator[BaseHistory]:
+        """
+        Load history windows in a background thread while the caller replays
+        loaded ones. History data is merged after all windows are consumed.
+        """
+        queue: Queue = Queue(maxsize=queue_size)
+        stopped: ThreadEvent = ThreadEvent()
 
-    def run_backtesting(self) -> None:
-        """"""
+        def put(item: object) -> bool:
+            # Retry with timeout so that producer quits when consumer stopped
+            while not stopped.is_set():
+                try:
+                    queue.put(item, timeout=0.1)
+                    return True
+                except Full:
+                    continue
+            return False
+
+        def produce() -> None:
+            try:
+                for data in self.iter_history_windows():
+                    if not put(data):
+                        return
+            except Exception as e:
+                put(e)
+                return
+            put(None)
+
+        thread: Thread = Thread(target=produce, daemon=True)
+        thread.start()
+
+        histories: List[BaseHistory] = []
+        try:
+            while True:
+                try:
+                    data: object = queue.get(timeout=0.1)
+                except Empty:
+                    if thread.is_alive():
+                        continue
+
+                    # Producer may put its last windows right before exiting
+                    try:
+                        data: object = queue.get_nowait()
+                    except Empty:
+                        break
+
+                if data is None:
+                    break
+                elif isinstance(data, Exception):
+                    raise data
+
+                histories.append(data)
+                yield data
+        finally:
+            stopped.set()
+
+        if histories:
+            self.history_data = histories[0].concatenate(histories)
+            self.output(f"历史数据加载完成，数据量：{len(self.history_data)}")
+
+    def run_backtesting(self, stream: bool = False, prefetch: bool = False) -> None:
+        """
+        Replay history data. With stream enabled, data is read from database
+        chunk by chunk during replay instead of from loaded history data.
+        With prefetch enabled, history windows are loaded in background while
+        replaying, and history data is filled after replay.
+        """
         if self.mode == BacktestingMode.BAR:
             func = self.new_bar
         else:
@@ -700,13 +1062,33 @@ class BacktestingEngine:
 
         self.strategy.on_start()
         self.strategy.trading = True
+
+        if stream or prefetch:
+            if stream:
+                self.output("开始流式回放历史数据")
+                chunks: Iterator = self.iter_history_data()
+            else:
+                self.output("开始预加载并回放历史数据")
+                chunks: Iterator = self.prefetch_history_data()
+
+            if not self.replay_chunks(func, chunks):
+                return
+
+            self.strategy.on_stop()
+            self.output("历史数据回放结束")
+            return
+
         self.output("开始回放历史数据")
 
+        # Pruning rules are checked about every 1% of data
+        batch_count: int = 100 if self.prune_rules else 10
+        output_step: int = batch_count // 10
+
         total_size: int = len(self.history_data)
-        batch_size: int = max(int(total_size / 10), 1)
+        batch_size: int = max(int(total_size / batch_count), 1)
 
         for ix, i in enumerate(range(0, total_size, batch_size)):
-            batch_data: list = self.history_data[i: i + batch_size]
+            batch_data: BaseHistory = self.history_data[i: i + batch_size]
             for data in batch_data:
                 try:
                     func(data)
@@ -715,241 +1097,409 @@ class BacktestingEngine:
                     self.output(traceback.format_exc())
                     return
 
-            progress = min(ix / 10, 1)
-            progress_bar: str = "=" * (ix + 1)
+            if self.check_prune():
+                return
+
+            if ix % output_step:
+                continue
+
+            n: int = ix // output_step
+            progress = min(n / 10, 1)
+            progress_bar: str = "=" * (n + 1)
             self.output(f"回放进度：{progress_bar} [{progress:.0%}]")
 
         self.strategy.on_stop()
         self.output("历史数据回放结束")
 
-    def calculate_result(self) -> DataFrame:
-        """"""
-        self.output("开始计算逐日盯市盈亏")
+    def check_prune(self) -> bool:
+        """
+        Check pruning rules with current equity, return True if backtesting
+        should be aborted.
+        """
+        if not self.prune_rules or not self.datetime:
+            return False
 
-        if not self.trades:
-            self.output("回测成交记录为空")
+        # Update position and cash flow with trades since last check
+        for trade in islice(self.trades.values(), self.prune_trade_count, None):
+            turnover: float = trade.price * trade.volume * self.size
+            if trade.direction == Direction.LONG:
+                self.prune_pos += trade.volume
+                self.prune_cash -= turnover
+            else:
+                self.prune_pos -= trade.volume
+                self.prune_cash += turnover
+            self.prune_cash -= turnover * self.rate + trade.volume * self.size * self.slippage
 
-        # Add trade data into daily reuslt.
-        for trade in self.trades.values():
-            d: date = trade.datetime.date()
-            daily_result: DailyResult = self.daily_results[d]
-            daily_result.add_trade(trade)
-
-        # Calculate daily result by iteration.
-        pre_close = 0
-        start_pos = 0
-
-        for daily_result in self.daily_results.values():
-            daily_result.calculate_pnl(
-                pre_close,
-                start_pos,
+        self.prune_trade_count = len(self.trades)
+
+        if self.mode == BacktestingMode.BAR:
+            price: float = self.bar.close_price
+        else:
+            price: float = self.tick.last_price
+
+        balance: float = self.capital + self.prune_cash + self.prune_pos * price * self.size
+        self.prune_peak = max(self.prune_peak, self.capital, balance)
+
+        rules: dict = self.prune_rules
+
+        if "min_balance" in rules and balance < rules["min_balance"]:
+            self.pruned = f"资金{balance:.2f}低于{rules['min_balance']}"
+
+        ddpercent: float = (self.prune_peak - balance) / self.prune_peak * 100
+        if "max_ddpercent" in rules and ddpercent > rules["max_ddpercent"]:
+            self.pruned = f"百分比回撤{ddpercent:.2f}%超过{rules['max_ddpercent']}%"
+
+        if "min_trade_count" in rules:
+            deadline, count = rules["min_trade_count"]
+            if self.datetime.replace(tzinfo=None) >= deadline and self.trade_count < count:
+                self.pruned = f"截至{deadline}成交笔数{self.trade_count}少于{count}"
+
+        if self.pruned:
+            self.output(f"触发剪枝规则，回测终止：{self.pruned}")
+            return True
+
+        return False
+
+    def run_batch(self, settings: List[dict], vectorized: bool = False) -> List[dict]:
+        """
+        Run backtesting for multiple strategy settings in current process,
+        with history data loaded only once. Return list of statistics.
+        """
+        self.load_data()
+        if not self.history_data:
+            return []
+
+        history: BaseHistory = self.history_data
+        fingerprint: str = history.get_fingerprint()
+        strategy_class: Type[CtaTemplate] = self.strategy_class
+        use_cache: bool = self.use_cache
+
+        results: List[dict] = []
+        for i, setting in enumerate(settings):
+            self.output(f"批量回测进度：{i + 1}/{len(settings)}，参数：{setting}")
+
+            # Reset order and trade state of last run, history data is kept
+            self.clear_data()
+            self.add_strategy(strategy_class, setting)
+
+            key: str = self.get_result_key(fingerprint, vectorized) if use_cache else ""
+            result: Optional[dict] = result_cache.get(key) if key else None
+            if result:
+                results.append(result["statistics"])
+                continue
+
+            if vectorized:
+                self.calculate_vectorized_arrays()
+            else:
+                self.set_indicator_source(fingerprint)
+                try:
+                    self.run_backtesting()
+                finally:
+                    indicator_cache.clear_source()
+                self.calculate_daily_arrays()
+
+            statistics: dict = self.calculate_statistics_array()
+            if key:
+                result_cache.put(key, self.get_result(statistics))
+            results.append(statistics)
+
+        return results
+
+    def run_vectorized_batch(
+        self,
+        settings: List[dict],
+        target_name: str = "",
+        max_elements: int = 2 ** 22
+    ) -> List[dict]:
+        """
+        Run vectorized backtesting for multiple strategy settings at once.
+
+        Target position, trades and daily pnl are held as 2D arrays of
+        settings × time. Settings are split into blocks so that each array
+        has at most max_elements values. Return list of statistics.
+        """
+        if self.mode != BacktestingMode.BAR:
+            self.output("向量化回测仅支持K线模式")
+            return []
+
+        self.load_data()
+        if not self.history_data:
+            return []
+
+        history: BarHistory = self.history_data
+        strategy_class: Type[CtaTemplate] = self.strategy_class
+
+        block_size: int = max(max_elements // len(history), 1)
+        results: List[dict] = []
+
+        for i in range(0, len(settings), block_size):
+            block: List[dict] = settings[i: i + block_size]
+            self.output(f"批量向量化回测进度：{i + len(block)}/{len(settings)}")
+
+            target_pos: np.ndarray = strategy_class.calculate_target_pos_batch(history, block)
+
+            if target_pos is None:
+                target_list: list = []
+                for setting in block:
+                    self.add_strategy(strategy_class, setting)
+                    target_list.append(self.strategy.calculate_target_pos(history))
+
+                if target_list[0] is None:
+                    self.output("策略未实现calculate_target_pos，无法进行向量化回测")
+                    return []
+                target_pos = np.stack(target_list)
+
+            daily: Dict[str, np.ndarray] = calculate_vectorized_result(
+                history,
+                target_pos,
                 self.size,
                 self.rate,
-                self.slippage
+                self.slippage,
+                self.pricetick
             )
 
-            pre_close = daily_result.close_price
-            start_pos = daily_result.end_pos
+            names: List[str] = ["net_pnl", "commission", "slippage", "turnover", "trade_count"]
+            for j in range(len(block)):
+                row: Dict[str, np.ndarray] = {"date": daily["date"]}
+                for name in names:
+                    row[name] = daily[name][j]
+
+                statistics, _ = calculate_daily_statistics(
+                    row,
+                    self.capital,
+                    self.risk_free,
+                    self.annual_days,
+                    target_name
+                )
+                results.append(statistics)
 
-        # Generate dataframe
-        results: defaultdict = defaultdict(list)
+        return results
 
-        for daily_result in self.daily_results.values():
-            for key, value in daily_result.__dict__.items():
-                results[key].append(value)
+    def replay_chunks(self, func: Callable, chunks: Iterator) -> bool:
+        """
+        Replay history data chunk by chunk, return False if stopped by
+        exception or pruning rule.
+        """
+        start: float = self.start.timestamp()
+        total: float = max(self.end.timestamp() - start, 1)
+        count: int = 0
+        step: int = 0
 
-        self.daily_df = DataFrame.from_dict(results).set_index("date")
+        for chunk in chunks:
+            if not len(chunk):
+                continue
 
-        self.output("逐日盯市盈亏计算完成")
-        return self.daily_df
+            for data in chunk:
+                try:
+                    func(data)
+                except Exception:
+                    self.output("触发异常，回测终止")
+                    self.output(traceback.format_exc())
+                    return False
 
-    def calculate_statistics(self, df: DataFrame = None, output=True) -> dict:
-        """"""
-        self.output("开始计算策略统计指标")
+            count += len(chunk)
 
-        # Check DataFrame input exterior
-        if df is None:
-            df: DataFrame = self.daily_df
+            if self.check_prune():
+                return False
 
-        # Init all statistics default value
-        start_date: str = ""
-        end_date: str = ""
-        total_days: int = 0
-        profit_days: int = 0
-        loss_days: int = 0
-        end_balance: float = 0
-        max_drawdown: float = 0
-        max_ddpercent: float = 0
-        max_drawdown_duration: int = 0
-        total_net_pnl: float = 0
-        daily_net_pnl: float = 0
-        total_commission: float = 0
-        daily_commission: float = 0
-        total_slippage: float = 0
-        daily_slippage: float = 0
-        total_turnover: float = 0
-        daily_turnover: float = 0
-        total_trade_count: int = 0
-        daily_trade_count: int = 0
-        total_return: float = 0
-        annual_return: float = 0
-        daily_return: float = 0
-        return_std: float = 0
-        sharpe_ratio: float = 0
-        return_drawdown_ratio: float = 0
-
-        # Check if balance is always positive
-        positive_balance: bool = False
+            # Estimate progress with datetime since total size is unknown
+            progress: float = min((chunk[-1].datetime.timestamp() - start) / total, 1)
+            if int(progress * 10) >= step:
+                step = int(progress * 10) + 1
+                progress_bar: str = "=" * step
+                self.output(f"回放进度：{progress_bar} [{progress:.0%}]")
 
-        if df is not None:
-            # Calculate balance related time series data
-            df["balance"] = df["net_pnl"].cumsum() + self.capital
-
-            # When balance falls below 0, set daily return to 0
-            pre_balance: Series = df["balance"].shift(1)
-            pre_balance.iloc[0] = self.capital
-            x = df["balance"] / pre_balance
-            x[x <= 0] = np.nan
-            df["return"] = np.log(x).fillna(0)
-
-            df["highlevel"] = (
-                df["balance"].rolling(
-                    min_periods=1, window=len(df), center=False).max()
+        self.output(f"回放数据量：{count}")
+        return True
+
+    def iter_history_data(self) -> Iterator[list]:
+        """
+        Iterate history data from database chunk by chunk.
+        """
+        database: BaseDatabase = get_database()
+
+        if self.mode == BacktestingMode.BAR:
+            return database.iter_bar_data(
+                self.symbol,
+                self.exchange,
+                self.interval,
+                self.start,
+                self.end
+            )
+        else:
+            return database.iter_tick_data(
+                self.symbol,
+                self.exchange,
+                self.start,
+                self.end
             )
-            df["drawdown"] = df["balance"] - df["highlevel"]
-            df["ddpercent"] = df["drawdown"] / df["highlevel"] * 100
 
-            # All balance value needs to be positive
-            positive_balance = (df["balance"] > 0).all()
-            if not positive_balance:
-                self.output("回测中出现爆仓（资金小于等于0），无法计算策略统计指标")
+    def run_vectorized_backtesting(self, target_pos: np.ndarray = None) -> DataFrame:
+        """
+        Run backtesting with target position of every bar, without replaying
+        bar by bar. Target position is taken from strategy if not provided.
+        """
+        results: Dict[str, np.ndarray] = self.calculate_vectorized_arrays(target_pos)
+        if results is None:
+            return None
 
-        # Calculate statistics value
-        if positive_balance:
-            # Calculate statistics value
-            start_date = df.index[0]
-            end_date = df.index[-1]
+        self.daily_df = DataFrame.from_dict(results).set_index("date")
 
-            total_days: int = len(df)
-            profit_days: int = len(df[df["net_pnl"] > 0])
-            loss_days: int = len(df[df["net_pnl"] < 0])
+        self.output("向量化回测完成")
+        return self.daily_df
 
-            end_balance = df["balance"].iloc[-1]
-            max_drawdown = df["drawdown"].min()
-            max_ddpercent = df["ddpercent"].min()
-            max_drawdown_end = df["drawdown"].idxmin()
+    def calculate_vectorized_arrays(self, target_pos: np.ndarray = None) -> Dict[str, np.ndarray]:
+        """
+        Calculate daily result arrays of vectorized backtesting.
+        """
+        self.output("开始向量化回测")
+
+        if self.mode != BacktestingMode.BAR:
+            self.output("向量化回测仅支持K线模式")
+            return None
+
+        if not self.history_data:
+            self.output("历史数据为空，无法进行向量化回测")
+            return None
+
+        if target_pos is None:
+            target_pos = self.strategy.calculate_target_pos(self.history_data)
+
+        if target_pos is None:
+            self.output("策略未实现calculate_target_pos，无法进行向量化回测")
+            return None
+
+        self.daily_arrays = calculate_vectorized_result(
+            self.history_data,
+            target_pos,
+            self.size,
+            self.rate,
+            self.slippage,
+            self.pricetick
+        )
+        return self.daily_arrays
 
-            if isinstance(max_drawdown_end, date):
-                max_drawdown_start = df["balance"][:max_drawdown_end].idxmax()
-                max_drawdown_duration: int = (max_drawdown_end - max_drawdown_start).days
-            else:
-                max_drawdown_duration: int = 0
+    def calculate_result(self) -> DataFrame:
+        """"""
+        self.output("开始计算逐日盯市盈亏")
 
-            total_net_pnl: float = df["net_pnl"].sum()
-            daily_net_pnl: float = total_net_pnl / total_days
+        if not self.trades:
+            self.output("回测成交记录为空")
 
-            total_commission: float = df["commission"].sum()
-            daily_commission: float = total_commission / total_days
+        results: Dict[str, np.ndarray] = self.calculate_daily_arrays()
+        self.daily_df = DataFrame.from_dict(results).set_index("date")
 
-            total_slippage: float = df["slippage"].sum()
-            daily_slippage: float = total_slippage / total_days
+        self.output("逐日盯市盈亏计算完成")
+        return self.daily_df
 
-            total_turnover: float = df["turnover"].sum()
-            daily_turnover: float = total_turnover / total_days
+    def calculate_daily_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Calculate daily result as numpy arrays, without creating DataFrame.
+        """
+        self.daily_arrays = calculate_daily_result(
+            list(self.daily_closes.keys()),
+            np.fromiter(self.daily_closes.values(), float, len(self.daily_closes)),
+            list(self.trades.values()),
+            self.size,
+            self.rate,
+            self.slippage
+        )
+        return self.daily_arrays
 
-            total_trade_count: int = df["trade_count"].sum()
-            daily_trade_count: int = total_trade_count / total_days
+    def calculate_statistics(self, df: DataFrame = None, output=True) -> dict:
+        """"""
+        self.output("开始计算策略统计指标")
 
-            total_return: float = (end_balance / self.capital - 1) * 100
-            annual_return: float = total_return / total_days * self.annual_days
-            daily_return: float = df["return"].mean() * 100
-            return_std: float = df["return"].std() * 100
+        # Check DataFrame input exterior
+        if df is None:
+            df: DataFrame = self.daily_df
 
-            if return_std:
-                daily_risk_free: float = self.risk_free / np.sqrt(self.annual_days)
-                sharpe_ratio: float = (daily_return - daily_risk_free) / return_std * np.sqrt(self.annual_days)
-            else:
-                sharpe_ratio: float = 0
+        if df is not None:
+            daily: Dict[str, np.ndarray] = {"date": list(df.index)}
+            for name in ["net_pnl", "commission", "slippage", "turnover", "trade_count"]:
+                daily[name] = df[name].to_numpy()
+        else:
+            daily: Dict[str, np.ndarray] = {"net_pnl": np.zeros(0)}
 
-            if max_ddpercent:
-                return_drawdown_ratio: float = -total_return / max_ddpercent
-            else:
-                return_drawdown_ratio = 0
+        statistics, series = calculate_daily_statistics(
+            daily,
+            self.capital,
+            self.risk_free,
+            self.annual_days
+        )
+
+        if df is not None:
+            # Add balance related time series data
+            for name, values in series.items():
+                df[name] = values
+
+            # All balance value needs to be positive
+            if not (df["balance"] > 0).all():
+                self.output("回测中出现爆仓（资金小于等于0），无法计算策略统计指标")
 
         # Output
         if output:
             self.output("-" * 30)
-            self.output(f"首个交易日：\t{start_date}")
-            self.output(f"最后交易日：\t{end_date}")
+            self.output(f"首个交易日：\t{statistics['start_date']}")
+            self.output(f"最后交易日：\t{statistics['end_date']}")
 
-            self.output(f"总交易日：\t{total_days}")
-            self.output(f"盈利交易日：\t{profit_days}")
-            self.output(f"亏损交易日：\t{loss_days}")
+            self.output(f"总交易日：\t{statistics['total_days']}")
+            self.output(f"盈利交易日：\t{statistics['profit_days']}")
+            self.output(f"亏损交易日：\t{statistics['loss_days']}")
 
             self.output(f"起始资金：\t{self.capital:,.2f}")
-            self.output(f"结束资金：\t{end_balance:,.2f}")
-
-            self.output(f"总收益率：\t{total_return:,.2f}%")
-            self.output(f"年化收益：\t{annual_return:,.2f}%")
-            self.output(f"最大回撤: \t{max_drawdown:,.2f}")
-            self.output(f"百分比最大回撤: {max_ddpercent:,.2f}%")
-            self.output(f"最长回撤天数: \t{max_drawdown_duration}")
-
-            self.output(f"总盈亏：\t{total_net_pnl:,.2f}")
-            self.output(f"总手续费：\t{total_commission:,.2f}")
-            self.output(f"总滑点：\t{total_slippage:,.2f}")
-            self.output(f"总成交金额：\t{total_turnover:,.2f}")
-            self.output(f"总成交笔数：\t{total_trade_count}")
-
-            self.output(f"日均盈亏：\t{daily_net_pnl:,.2f}")
-            self.output(f"日均手续费：\t{daily_commission:,.2f}")
-            self.output(f"日均滑点：\t{daily_slippage:,.2f}")
-            self.output(f"日均成交金额：\t{daily_turnover:,.2f}")
-            self.output(f"日均成交笔数：\t{daily_trade_count}")
-
-            self.output(f"日均收益率：\t{daily_return:,.2f}%")
-            self.output(f"收益标准差：\t{return_std:,.2f}%")
-            self.output(f"Sharpe Ratio：\t{sharpe_ratio:,.2f}")
-            self.output(f"收益回撤比：\t{return_drawdown_ratio:,.2f}")
-
-        statistics: dict = {
-            "start_date": start_date,
-            "end_date": end_date,
-            "total_days": total_days,
-            "profit_days": profit_days,
-            "loss_days": loss_days,
-            "capital": self.capital,
-            "end_balance": end_balance,
-            "max_drawdown": max_drawdown,
-            "max_ddpercent": max_ddpercent,
-            "max_drawdown_duration": max_drawdown_duration,
-            "total_net_pnl": total_net_pnl,
-            "daily_net_pnl": daily_net_pnl,
-            "total_commission": total_commission,
-            "daily_commission": daily_commission,
-            "total_slippage": total_slippage,
-            "daily_slippage": daily_slippage,
-            "total_turnover": total_turnover,
-            "daily_turnover": daily_turnover,
-            "total_trade_count": total_trade_count,
-            "daily_trade_count": daily_trade_count,
-            "total_return": total_return,
-            "annual_return": annual_return,
-            "daily_return": daily_return,
-            "return_std": return_std,
-            "sharpe_ratio": sharpe_ratio,
-            "return_drawdown_ratio": return_drawdown_ratio,
-        }
-
-        # Filter potential error infinite value
-        for key, value in statistics.items():
-            if value in (np.inf, -np.inf):
-                value = 0
-            statistics[key] = np.nan_to_num(value)
+            self.output(f"结束资金：\t{statistics['end_balance']:,.2f}")
+
+            self.output(f"总收益率：\t{statistics['total_return']:,.2f}%")
+            self.output(f"年化收益：\t{statistics['annual_return']:,.2f}%")
+            self.output(f"最大回撤: \t{statistics['max_drawdown']:,.2f}")
+            self.output(f"百分比最大回撤: {statistics['max_ddpercent']:,.2f}%")
+            self.output(f"最长回撤天数: \t{statistics['max_drawdown_duration']}")
+
+            self.output(f"总盈亏：\t{statistics['total_net_pnl']:,.2f}")
+            self.output(f"总手续费：\t{statistics['total_commission']:,.2f}")
+            self.output(f"总滑点：\t{statistics['total_slippage']:,.2f}")
+            self.output(f"总成交金额：\t{statistics['total_turnover']:,.2f}")
+            self.output(f"总成交笔数：\t{statistics['total_trade_count']}")
+
+            self.output(f"日均盈亏：\t{statistics['daily_net_pnl']:,.2f}")
+            self.output(f"日均手续费：\t{statistics['daily_commission']:,.2f}")
+            self.output(f"日均滑点：\t{statistics['daily_slippage']:,.2f}")
+            self.output(f"日均成交金额：\t{statistics['daily_turnover']:,.2f}")
+            self.output(f"日均成交笔数：\t{statistics['daily_trade_count']}")
+
+            self.output(f"日均收益率：\t{statistics['daily_return']:,.2f}%")
+            self.output(f"收益标准差：\t{statistics['return_std']:,.2f}%")
+            self.output(f"Sharpe Ratio：\t{statistics['sharpe_ratio']:,.2f}")
+            self.output(f"收益回撤比：\t{statistics['return_drawdown_ratio']:,.2f}")
 
         self.output("策略统计指标计算完成")
         return statistics
 
+    def calculate_statistics_array(self, target_name: str = "") -> dict:
+        """
+        Calculate statistics from daily result arrays, without creating
+        DataFrame. Only target_name value is calculated if provided.
+        """
+        daily: Dict[str, np.ndarray] = self.daily_arrays
+        if daily is None:
+            daily = {"net_pnl": np.zeros(0)}
+
+        statistics, series = calculate_daily_statistics(
+            daily,
+            self.capital,
+            self.risk_free,
+            self.annual_days,
+            target_name
+        )
+
+        # All balance value needs to be positive
+        balance: np.ndarray = series["balance"]
+        if len(balance) and not (balance > 0).all():
+            self.output("回测中出现爆仓（资金小于等于0），无法计算策略统计指标")
+
+        return statistics
+
     def show_chart(self, df: DataFrame = None) -> None:
         """"""
         # Check DataFrame input exterior
@@ -993,24 +1543,104 @@ class BacktestingEngine:
         fig.update_layout(height=1000, width=1000)
         fig.show()
 
+    def add_optimization_run(
+        self,
+        store: Optional[ResultStore],
+        optimization_setting: OptimizationSetting,
+        algorithm: str,
+        vectorized: bool,
+        history: Optional[HistoryHandle]
+    ) -> str:
+        """
+        Register optimization run in result store and return its run id.
+
+        Run id is hash of strategy code, backtesting parameters, parameter space
+        and history data, so that rerun of the same task resumes the stored run.
+        """
+        if not store:
+            return ""
+
+        file_path: str = getfile(self.strategy_class)
+        code_hash: str = get_code_hash(file_path, os.path.getmtime(file_path))
+        fingerprint: str = history.fingerprint if history else ""
+
+        parameters: tuple = (
+            self.strategy_class.__name__,
+            sorted(optimization_setting.params.items()),
+            [name for name, _ in optimization_setting.constraints],
+            optimization_setting.target_name,
+            algorithm,
+            self.vt_symbol,
+            self.interval.value,
+            self.start,
+            self.end,
+            self.rate,
+            self.slippage,
+            self.size,
+            self.pricetick,
+            self.capital,
+            self.mode.value,
+            self.risk_free,
+            self.annual_days,
+            vectorized,
+        )
+        run_id: str = sha1(f"{code_hash}|{parameters!r}|{fingerprint}".encode()).hexdigest()
+
+        name: str = (
+            f"{self.strategy_class.__name__} {self.vt_symbol} {self.interval.value} "
+            f"{self.start:%Y-%m-%d}~{self.end:%Y-%m-%d} {algorithm}"
+        )
+        store.add_run(
+            run_id,
+            name,
+            optimization_setting.target_name,
+            optimization_setting.generate_settings().count_valid()
+        )
+        return run_id
+
     def run_bf_optimization(
         self,
         optimization_setting: OptimizationSetting,
         output: bool = True,
-        max_workers: int = None
+        max_workers: int = None,
+        vectorized: bool = False,
+        executor: ProcessPoolExecutor = None,
+        store: ResultStore = None,
+        monitor: OptimizationMonitor = None
     ) -> list:
         """"""
         if not check_optimization_setting(optimization_setting):
             return
 
-        evaluate_func: callable = wrap_evaluate(self, optimization_setting.target_name)
-        results: list = run_bf_optimization(
-            evaluate_func,
-            optimization_setting,
-            get_target_value,
-            max_workers=max_workers,
-            output=self.output
-        )
+        # Workers replay history from shared memory instead of loading it again
+        shm, history = self.share_history_data()
+        try:
+            run_id: str = self.add_optimization_run(
+                store, optimization_setting, "穷举", vectorized, history
+            )
+
+            evaluate_func: callable = wrap_evaluate(
+                self,
+                optimization_setting.target_name,
+                vectorized,
+                history,
+                prune_rules=optimization_setting.prune_rules
+            )
+            results: list = run_bf_optimization(
+                evaluate_func,
+                optimization_setting,
+                get_target_value,
+                max_workers=max_workers,
+                output=self.output,
+                executor=executor,
+                store=store,
+                run_id=run_id,
+                monitor=monitor
+            )
+        finally:
+            if shm:
+                shm.close()
+                shm.unlink()
 
         if output:
             for result in results:
@@ -1026,21 +1656,46 @@ class BacktestingEngine:
         optimization_setting: OptimizationSetting,
         output: bool = True,
         max_workers: int = None,
-        ngen_size: int = 30
+        ngen_size: int = 30,
+        vectorized: bool = False,
+        executor: ProcessPoolExecutor = None,
+        store: ResultStore = None,
+        monitor: OptimizationMonitor = None
     ) -> list:
         """"""
         if not check_optimization_setting(optimization_setting):
             return
 
-        evaluate_func: callable = wrap_evaluate(self, optimization_setting.target_name)
-        results: list = run_ga_optimization(
-            evaluate_func,
-            optimization_setting,
-            get_target_value,
-            max_workers=max_workers,
-            ngen_size=ngen_size,
-            output=self.output
-        )
+        # Workers replay history from shared memory instead of loading it again
+        shm, history = self.share_history_data()
+        try:
+            run_id: str = self.add_optimization_run(
+                store, optimization_setting, "遗传", vectorized, history
+            )
+
+            evaluate_func: callable = wrap_evaluate(
+                self,
+                optimization_setting.target_name,
+                vectorized,
+                history,
+                prune_rules=optimization_setting.prune_rules
+            )
+            results: list = run_ga_optimization(
+                evaluate_func,
+                optimization_setting,
+                get_target_value,
+                max_workers=max_workers,
+                ngen_size=ngen_size,
+                output=self.output,
+                executor=executor,
+                store=store,
+                run_id=run_id,
+                monitor=monitor
+            )
+        finally:
+            if shm:
+                shm.close()
+                shm.unlink()
 
         if output:
             for result in results:
@@ -1049,15 +1704,148 @@ class BacktestingEngine:
 
         return results
 
-    def update_daily_close(self, price: float) -> None:
+    def run_bayes_optimization(
+        self,
+        optimization_setting: OptimizationSetting,
+        output: bool = True,
+        max_workers: int = None,
+        max_evals: int = None,
+        vectorized: bool = False,
+        executor: ProcessPoolExecutor = None,
+        store: ResultStore = None,
+        monitor: OptimizationMonitor = None
+    ) -> list:
         """"""
-        d: date = self.datetime.date()
+        if not check_optimization_setting(optimization_setting):
+            return
 
-        daily_result: Optional[DailyResult] = self.daily_results.get(d, None)
-        if daily_result:
-            daily_result.close_price = price
-        else:
-            self.daily_results[d] = DailyResult(d, price)
+        # Workers replay history from shared memory instead of loading it again
+        shm, history = self.share_history_data()
+        try:
+            run_id: str = self.add_optimization_run(
+                store, optimization_setting, "贝叶斯", vectorized, history
+            )
+
+            evaluate_func: callable = wrap_evaluate(
+                self,
+                optimization_setting.target_name,
+                vectorized,
+                history,
+                prune_rules=optimization_setting.prune_rules
+            )
+            results: list = run_bayes_optimization(
+                evaluate_func,
+                optimization_setting,
+                get_target_value,
+                max_workers=max_workers,
+                max_evals=max_evals,
+                output=self.output,
+                executor=executor,
+                store=store,
+                run_id=run_id,
+                monitor=monitor
+            )
+        finally:
+            if shm:
+                shm.close()
+                shm.unlink()
+
+        if output:
+            for result in results:
+                msg: str = f"参数：{result[0]}, 目标：{result[1]}"
+                self.output(msg)
+
+        return results
+
+    def run_halving_optimization(
+        self,
+        optimization_setting: OptimizationSetting,
+        output: bool = True,
+        max_workers: int = None,
+        fractions: List[float] = None,
+        eta: float = 3,
+        vectorized: bool = False,
+        executor: ProcessPoolExecutor = None,
+        store: ResultStore = None,
+        monitor: OptimizationMonitor = None
+    ) -> list:
+        """
+        Run successive halving on growing windows from start, fractions are
+        lengths of windows relative to the full data range, [1/9, 1/3, 1] by default.
+        """
+        if not check_optimization_setting(optimization_setting):
+            return
+
+        if not fractions:
+            fractions = [eta ** -2, eta ** -1, 1]
+
+        fractions = sorted(f for f in fractions if 0 < f < 1) + [1]
+
+        # Workers replay history from shared memory instead of loading it again
+        shm, history = self.share_history_data()
+        try:
+            # Windows are measured on range covered by history data, which must exist
+            if history is None:
+                self.output("逐级淘汰优化失败，历史数据为空")
+                return
+
+            schedule: str = "/".join(f"{f:.2f}" for f in fractions)
+            run_id: str = self.add_optimization_run(
+                store, optimization_setting, f"逐级淘汰({schedule})", vectorized, history
+            )
+
+            data_start: datetime = self.history_data.get_datetime(0).replace(tzinfo=None)
+            data_end: datetime = self.history_data.get_datetime(-1).replace(tzinfo=None)
+            duration: timedelta = data_end - data_start
+
+            evaluate_funcs: List[callable] = [
+                wrap_evaluate(
+                    self,
+                    optimization_setting.target_name,
+                    vectorized,
+                    history,
+                    data_start + duration * fraction,
+                    optimization_setting.prune_rules
+                )
+                for fraction in fractions[:-1]
+            ]
+            evaluate_funcs.append(
+                wrap_evaluate(
+                    self,
+                    optimization_setting.target_name,
+                    vectorized,
+                    history,
+                    prune_rules=optimization_setting.prune_rules
+                )
+            )
+
+            results: list = run_halving_optimization(
+                evaluate_funcs,
+                optimization_setting,
+                get_target_value,
+                max_workers=max_workers,
+                eta=eta,
+                output=self.output,
+                executor=executor,
+                store=store,
+                run_id=run_id,
+                monitor=monitor
+            )
+        finally:
+            if shm:
+                shm.close()
+                shm.unlink()
+
+        if output:
+            for result in results:
+                msg: str = f"参数：{result[0]}, 目标：{result[1]}"
+                self.output(msg)
+
+        return results
+
+    def update_daily_close(self, price: float) -> None:
+        """"""
+        self.daily_closes[self.datetime.date()] = price
 
     def new_bar(self, bar: BarData) -> None:
         """"""
@@ -1096,7 +1884,23 @@ class BacktestingEngine:
             long_best_price = long_cross_price
             short_best_price = short_cross_price
 
-        for order in list(self.active_limit_orders.values()):
+        # Only new orders and orders crossed by price need to be checked
+        candidates: Dict[int, OrderData] = {}
+
+        for seq, order in self.submitting_orders:
+            if order.vt_orderid in self.active_limit_orders:
+                candidates[seq] = order
+        self.submitting_orders.clear()
+
+        if long_cross_price > 0:
+            candidates.update(self.long_limit_heap.pop_crossed(long_cross_price))
+        if short_cross_price > 0:
+            candidates.update(self.short_limit_heap.pop_crossed(short_cross_price))
+
+        # Process in sending order, same as iterating active orders
+        for seq in sorted(candidates):
+            order: OrderData = candidates[seq]
+
             # Push order update with status "not traded" (pending).
             if order.status == Status.SUBMITTING:
                 order.status = Status.NOTTRADED
@@ -1169,7 +1973,15 @@ class BacktestingEngine:
             long_best_price = long_cross_price
             short_best_price = short_cross_price
 
-        for stop_order in list(self.active_stop_orders.values()):
+        candidates: Dict[int, StopOrder] = dict(
+            self.long_stop_heap.pop_crossed(long_cross_price)
+            + self.short_stop_heap.pop_crossed(short_cross_price)
+        )
+
+        # Process in sending order, same as iterating active orders
+        for seq in sorted(candidates):
+            stop_order: StopOrder = candidates[seq]
+
             # Check whether stop order can be triggered.
             long_cross: bool = (
                 stop_order.direction == Direction.LONG
@@ -1329,6 +2141,11 @@ class BacktestingEngine:
         self.active_stop_orders[stop_order.stop_orderid] = stop_order
         self.stop_orders[stop_order.stop_orderid] = stop_order
 
+        if direction == Direction.LONG:
+            self.long_stop_heap.push(stop_order.stop_orderid, price, self.stop_order_count, stop_order)
+        elif direction == Direction.SHORT:
+            self.short_stop_heap.push(stop_order.stop_orderid, price, self.stop_order_count, stop_order)
+
         return stop_order.stop_orderid
 
     def send_limit_order(
@@ -1356,6 +2173,12 @@ class BacktestingEngine:
 
         self.active_limit_orders[order.vt_orderid] = order
         self.limit_orders[order.vt_orderid] = order
+        self.submitting_orders.append((self.limit_order_count, order))
+
+        if direction == Direction.LONG:
+            self.long_limit_heap.push(order.vt_orderid, price, self.limit_order_count, order)
+        elif direction == Direction.SHORT:
+            self.short_limit_heap.push(order.vt_orderid, price, self.limit_order_count, order)
 
         return order.vt_orderid
 
@@ -1463,7 +2286,194 @@ class BacktestingEngine:
         """
         Return all daily result data.
         """
-        return list(self.daily_results.values())
+        if self.daily_df is None:
+            return []
+
+        daily_trades: defaultdict = defaultdict(list)
+        for trade in self.trades.values():
+            daily_trades[trade.datetime.date()].append(trade)
+
+        daily_results: list = []
+
+        for d, row in zip(self.daily_df.index, self.daily_df.to_dict("records")):
+            daily_result: DailyResult = DailyResult(d, row["close_price"])
+            daily_result.trades = daily_trades[d]
+
+            for key in daily_result.__dict__:
+                if key in row:
+                    setattr(daily_result, key, row[key])
+
+            daily_results.append(daily_result)
+
+        return daily_results
+
+
+class OrderHeap:
+    """
+    Active orders of one direction kept in a heap sorted by price.
+
+    Orders are removed lazily: entries of orders no longer in the active
+    dict are skipped when popped, and dropped when the heap is compacted.
+    """
+
+    def __init__(self, active_orders: dict, descending: bool) -> None:
+        """"""
+        self.active_orders: dict = active_orders
+        self.descending: bool = descending
+        self.heap: list = []
+
+    def push(self, key: str, price: float, seq: int, order: object) -> None:
+        """
+        Add an active order, seq keeps orders with same price in sending order.
+        """
+        if self.descending:
+            price = -price
+        heappush(self.heap, (price, seq, key, order))
+
+        # Compact when cancelled orders pile up in heap
+        if len(self.heap) > 2 * len(self.active_orders) + 64:
+            self.heap = [e for e in self.heap if self.active_orders.get(e[2]) is e[3]]
+            heapify(self.heap)
+
+    def pop_crossed(self, cross_price: float) -> List[Tuple[int, object]]:
+        """
+        Pop all active orders with price crossed by cross_price.
+
+        Descending heap pops orders with price >= cross_price, ascending heap
+        pops orders with price <= cross_price.
+        """
+        if self.descending:
+            cross_price = -cross_price
+
+        crossed: list = []
+        heap: list = self.heap
+        while heap and heap[0][0] <= cross_price:
+            _, seq, key, order = heappop(heap)
+            if self.active_orders.get(key) is order:
+                crossed.append((seq, order))
+        return crossed
+
+    def clear(self) -> None:
+        """"""
+        self.heap.clear()
+
+
+class ResultCache:
+    """
+    On-disk cache of backtesting result.
+
+    Result is keyed by hash of strategy source code, parameters and history
+    data fingerprint, and stored as compressed pickle. Least recently used
+    files are evicted when total size exceeds max_size.
+    """
+
+    def __init__(self, folder_name: str = "backtesting_cache", max_size: int = 1024 ** 3) -> None:
+        """"""
+        self.folder_name: str = folder_name
+        self.max_size: int = max_size
+
+        self.folder: Path = None
+        self.total_size: int = None
+
+    def get_path(self, key: str) -> Path:
+        """"""
+        if not self.folder:
+            self.folder = get_folder_path(self.folder_name)
+        return self.folder.joinpath(f"{key}.pkl.zlib")
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Return cached result, None if not found.
+        """
+        path: Path = self.get_path(key)
+
+        try:
+            data: bytes = path.read_bytes()
+            result: dict = pickle.loads(zlib.decompress(data))
+        except Exception:
+            return None
+
+        # Update modify time for LRU eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        return result
+
+    def put(self, key: str, result: dict) -> None:
+        """
+        Save result into cache and evict old files if necessary.
+        """
+        path: Path = self.get_path(key)
+        data: bytes = zlib.compress(pickle.dumps(result, pickle.HIGHEST_PROTOCOL), 1)
+
+        # Write into temp file first so that readers never see partial file
+        temp_path: Path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            temp_path.write_bytes(data)
+            os.replace(temp_path, path)
+        except OSError:
+            return
+
+        if self.total_size is None:
+            self.total_size = sum(f.stat().st_size for f in self.folder.glob("*.pkl.zlib"))
+        else:
+            self.total_size += len(data)
+
+        if self.total_size > self.max_size:
+            self.evict()
+
+    def evict(self) -> None:
+        """
+        Remove least recently used files until total size is within limit.
+        """
+        files: list = []
+        for f in self.folder.glob("*.pkl.zlib"):
+            try:
+                stat: os.stat_result = f.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, f))
+
+        files.sort()
+        total_size: int = sum(size for _, size, _ in files)
+
+        # Evict down to 90% of max size to avoid evicting on every put
+        for _, size, f in files:
+            if total_size <= self.max_size * 0.9:
+                break
+
+            try:
+                f.unlink()
+                total_size -= size
+            except OSError:
+                continue
+
+        self.total_size = total_size
+
+    def clear(self) -> None:
+        """"""
+        if not self.folder:
+            self.get_path("")
+
+        for f in self.folder.glob("*.pkl.zlib"):
+            try:
+                f.unlink()
+            except OSError:
+                continue
+        self.total_size = 0
+
+
+result_cache: ResultCache = ResultCache()
+
+
+@lru_cache(maxsize=999)
+def get_code_hash(file_path: str, mtime: float) -> str:
+    """
+    Return hash of source code file, cached by modify time.
+    """
+    return sha1(Path(file_path).read_bytes()).hexdigest()
 
 
 class DailyResult:
@@ -1540,35 +2550,393 @@ class DailyResult:
         self.net_pnl = self.total_pnl - self.commission - self.slippage
 
 
+def calculate_daily_pnl(
+    close_price: np.ndarray,
+    pos_change: np.ndarray,
+    trade_volume: np.ndarray,
+    trade_value: np.ndarray,
+    turnover_value: np.ndarray,
+    trade_count: np.ndarray,
+    size: float,
+    rate: float,
+    slippage: float
+) -> Dict[str, np.ndarray]:
+    """
+    Calculate daily mark-to-market pnl with trades aggregated by day.
+
+    The same as DailyResult.calculate_pnl, trade arrays are:
+        * pos_change: sum of signed volume
+        * trade_volume: sum of absolute volume
+        * trade_value: sum of signed volume * price
+        * turnover_value: sum of absolute volume * price
+    """
+    # If no pre_close provided on the first day,
+    # use value 1 to avoid zero division error
+    pre_close: np.ndarray = np.zeros_like(close_price)
+    pre_close[1:] = close_price[:-1]
+    pre_close[pre_close == 0] = 1
+
+    end_pos: np.ndarray = np.cumsum(pos_change, axis=-1)
+    start_pos: np.ndarray = end_pos - pos_change
+
+    holding_pnl: np.ndarray = start_pos * (close_price - pre_close) * size
+    trading_pnl: np.ndarray = (pos_change * close_price - trade_value) * size
+
+    turnover: np.ndarray = turnover_value * size
+    commission: np.ndarray = turnover * rate
+    slippage_cost: np.ndarray = trade_volume * size * slippage
+
+    total_pnl: np.ndarray = trading_pnl + holding_pnl
+    net_pnl: np.ndarray = total_pnl - commission - slippage_cost
+
+    return {
+        "close_price": close_price,
+        "pre_close": pre_close,
+        "trade_count": trade_count,
+        "start_pos": start_pos,
+        "end_pos": end_pos,
+        "turnover": turnover,
+        "commission": commission,
+        "slippage": slippage_cost,
+        "trading_pnl": trading_pnl,
+        "holding_pnl": holding_pnl,
+        "total_pnl": total_pnl,
+        "net_pnl": net_pnl,
+    }
+
+
+def calculate_daily_result(
+    dates: List[date],
+    close_prices: np.ndarray,
+    trades: List[TradeData],
+    size: float,
+    rate: float,
+    slippage: float
+) -> Dict[str, np.ndarray]:
+    """
+    Calculate daily result by bucketing trades into sorted dates.
+    """
+    count: int = len(dates)
+
+    day_ordinals: np.ndarray = np.fromiter((d.toordinal() for d in dates), np.int64, count)
+    trade_ordinals: np.ndarray = np.fromiter(
+        (trade.datetime.date().toordinal() for trade in trades), np.int64, len(trades)
+    )
+    ix: np.ndarray = np.searchsorted(day_ordinals, trade_ordinals)
+
+    volume: np.ndarray = np.fromiter((trade.volume for trade in trades), float, len(trades))
+    price: np.ndarray = np.fromiter((trade.price for trade in trades), float, len(trades))
+    long: np.ndarray = np.fromiter(
+        (trade.direction == Direction.LONG for trade in trades), bool, len(trades)
+    )
+    pos_change: np.ndarray = np.where(long, volume, -volume)
+
+    results: Dict[str, np.ndarray] = calculate_daily_pnl(
+        close_prices,
+        np.bincount(ix, pos_change, count),
+        np.bincount(ix, volume, count),
+        np.bincount(ix, pos_change * price, count),
+        np.bincount(ix, volume * price, count),
+        np.bincount(ix, minlength=count),
+        size,
+        rate,
+        slippage
+    )
+    results["date"] = dates
+
+    return results
+
+
+def calculate_vectorized_result(
+    history: BarHistory,
+    target_pos: np.ndarray,
+    size: float,
+    rate: float,
+    slippage: float,
+    pricetick: float
+) -> Dict[str, np.ndarray]:
+    """
+    Calculate daily result from target position of every bar.
+
+    Target position decided on bar i is traded on bar i + 1, with the same
+    price rule as a limit order sent at bar i close price: long filled at
+    min(price, open), short filled at max(price, open).
+
+    Target position can also be 2D array of settings × bars, then every
+    trade related result is 2D array of settings × days.
+
+    Position change crossing zero counts as two trades, closing the old
+    position and opening the new one, same as orders sent by strategies.
+    """
+    close_price: np.ndarray = history.close_price
+    open_price: np.ndarray = history.open_price
+
+    # Position changes when orders sent on last bar get filled
+    target_pos = np.asarray(target_pos, dtype=float)
+    change: np.ndarray = np.zeros(target_pos.shape)
+    if change.shape[-1] > 1:
+        change[..., 1] = target_pos[..., 0]
+        np.subtract(target_pos[..., 1:-1], target_pos[..., :-2], out=change[..., 2:])
+
+    order_price: np.ndarray = np.empty_like(close_price)
+    order_price[1:] = close_price[:-1]
+    order_price[:1] = close_price[:1]
+    if pricetick:
+        order_price = np.round(order_price / pricetick) * pricetick
+
+    long_price: np.ndarray = np.minimum(order_price, open_price)
+    short_price: np.ndarray = np.maximum(order_price, open_price)
+
+    # Only bars with position change are trades, which are aggregated into days
+    days: np.ndarray = history.get_days()
+    day_flags: np.ndarray = np.diff(days, prepend=days[0] - 1) != 0
+    starts: np.ndarray = np.flatnonzero(day_flags)
+    ends: np.ndarray = np.append(starts[1:], len(days)) - 1
+    day_ix: np.ndarray = np.cumsum(day_flags) - 1
+
+    trade_ix: np.ndarray = np.flatnonzero(change)
+    rows, bars = np.divmod(trade_ix, change.shape[-1])
+    pos_change: np.ndarray = change.ravel()[trade_ix]
+    volume: np.ndarray = np.abs(pos_change)
+    trade_price: np.ndarray = np.where(pos_change > 0, long_price[bars], short_price[bars])
+
+    # Position after change on bar i is target decided on bar i - 1
+    new_pos: np.ndarray = target_pos.reshape(-1, change.shape[-1])[rows, bars - 1]
+    trade_count: np.ndarray = np.where(new_pos * (new_pos - pos_change) < 0, 2, 1)
+
+    day_count: int = len(starts)
+    shape: tuple = change.shape[:-1] + (day_count,)
+    ix: np.ndarray = rows * day_count + day_ix[bars]
+
+    def aggregate(values: Optional[np.ndarray]) -> np.ndarray:
+        """"""
+        return np.bincount(ix, values, int(np.prod(shape))).reshape(shape)
+
+    results: Dict[str, np.ndarray] = calculate_daily_pnl(
+        close_price[ends],
+        aggregate(pos_change),
+        aggregate(volume),
+        aggregate(pos_change * trade_price),
+        aggregate(volume * trade_price),
+        aggregate(trade_count).astype(np.int64),
+        size,
+        rate,
+        slippage
+    )
+    results["date"] = [date.fromordinal(EPOCH_ORDINAL + d) for d in days[starts].tolist()]
+
+    return results
+
+
+def calculate_daily_statistics(
+    daily: Dict[str, np.ndarray],
+    capital: float,
+    risk_free: float,
+    annual_days: int,
+    target_name: str = ""
+) -> Tuple[dict, Dict[str, np.ndarray]]:
+    """
+    Calculate statistics from daily result arrays with numpy only.
+
+    Return statistics dict and balance related time series. When target_name
+    is given, only the series and value needed by that target is calculated.
+    """
+    def need(*names: str) -> bool:
+        return not target_name or target_name in names
+
+    # Init all statistics default value
+    statistics: dict = {
+        "start_date": "",
+        "end_date": "",
+        "total_days": 0,
+        "profit_days": 0,
+        "loss_days": 0,
+        "capital": capital,
+        "end_balance": 0,
+        "max_drawdown": 0,
+        "max_ddpercent": 0,
+        "max_drawdown_duration": 0,
+        "total_net_pnl": 0,
+        "daily_net_pnl": 0,
+        "total_commission": 0,
+        "daily_commission": 0,
+        "total_slippage": 0,
+        "daily_slippage": 0,
+        "total_turnover": 0,
+        "daily_turnover": 0,
+        "total_trade_count": 0,
+        "daily_trade_count": 0,
+        "total_return": 0,
+        "annual_return": 0,
+        "daily_return": 0,
+        "return_std": 0,
+        "sharpe_ratio": 0,
+        "return_drawdown_ratio": 0,
+    }
+    series: Dict[str, np.ndarray] = {}
+
+    net_pnl: np.ndarray = np.asarray(daily["net_pnl"], dtype=float)
+    total_days: int = len(net_pnl)
+
+    # Calculate balance related time series data
+    balance: np.ndarray = np.cumsum(net_pnl) + capital
+    series["balance"] = balance
+
+    drawdown_names: tuple = (
+        "max_drawdown",
+        "max_ddpercent",
+        "max_drawdown_duration",
+        "return_drawdown_ratio"
+    )
+    if need("daily_return", "return_std", "sharpe_ratio"):
+        # When balance falls below 0, set daily return to 0
+        pre_balance: np.ndarray = np.empty(total_days)
+        pre_balance[:1] = capital
+        pre_balance[1:] = balance[:-1]
+
+        x: np.ndarray = balance / pre_balance
+        valid: np.ndarray = x > 0
+        series["return"] = np.log(x, out=np.zeros(total_days), where=valid)
+
+    if need(*drawdown_names):
+        highlevel: np.ndarray = np.maximum.accumulate(balance)
+        series["highlevel"] = highlevel
+        series["drawdown"] = balance - highlevel
+        series["ddpercent"] = series["drawdown"] / highlevel * 100
+
+    # All balance value needs to be positive
+    if total_days and (balance > 0).all():
+        dates: list = daily.get("date", [])
+        if len(dates):
+            statistics["start_date"] = dates[0]
+            statistics["end_date"] = dates[-1]
+
+        statistics["total_days"] = total_days
+        statistics["profit_days"] = int(np.count_nonzero(net_pnl > 0))
+        statistics["loss_days"] = int(np.count_nonzero(net_pnl < 0))
+
+        end_balance: float = balance[-1]
+        statistics["end_balance"] = end_balance
+
+        total_return: float = (end_balance / capital - 1) * 100
+        statistics["total_return"] = total_return
+        statistics["annual_return"] = total_return / total_days * annual_days
+
+        if need(*drawdown_names):
+            drawdown: np.ndarray = series["drawdown"]
+            max_ddpercent: float = series["ddpercent"].min()
+            statistics["max_drawdown"] = drawdown.min()
+            statistics["max_ddpercent"] = max_ddpercent
+
+            if need("max_drawdown_duration") and len(dates):
+                end_ix: int = int(np.argmin(drawdown))
+                start_ix: int = int(np.argmax(balance[:end_ix + 1]))
+                if isinstance(dates[end_ix], date):
+                    statistics["max_drawdown_duration"] = (dates[end_ix] - dates[start_ix]).days
+
+            if max_ddpercent:
+                statistics["return_drawdown_ratio"] = -total_return / max_ddpercent
+
+        total_net_pnl: float = net_pnl.sum()
+        statistics["total_net_pnl"] = total_net_pnl
+        statistics["daily_net_pnl"] = total_net_pnl / total_days
+
+        for name in ["commission", "slippage", "turnover", "trade_count"]:
+            if not need(f"total_{name}", f"daily_{name}"):
+                continue
+            total: float = np.sum(daily[name])
+            statistics[f"total_{name}"] = total
+            statistics[f"daily_{name}"] = total / total_days
+
+        if need("daily_return", "return_std", "sharpe_ratio"):
+            returns: np.ndarray = series["return"]
+            daily_return: float = returns.mean() * 100
+            if total_days > 1:
+                return_std: float = returns.std(ddof=1) * 100
+            else:
+                return_std: float = np.nan
+            statistics["daily_return"] = daily_return
+            statistics["return_std"] = return_std
+
+            if return_std:
+                daily_risk_free: float = risk_free / np.sqrt(annual_days)
+                sharpe_ratio: float = (daily_return - daily_risk_free) / return_std * np.sqrt(annual_days)
+            else:
+                sharpe_ratio: float = 0
+            statistics["sharpe_ratio"] = sharpe_ratio
+
+    if target_name:
+        statistics = {target_name: statistics[target_name]}
+
+    # Filter potential error infinite value, float is checked without numpy for speed
+    for key, value in statistics.items():
+        if isinstance(value, float):
+            statistics[key] = np.float64(value if isfinite(value) else 0)
+            continue
+
+        if value in (np.inf, -np.inf):
+            value = 0
+        statistics[key] = np.nan_to_num(value)
+
+    return statistics, series
+
+
 @lru_cache(maxsize=999)
-def load_bar_data(
+def load_bar_history(
     symbol: str,
     exchange: Exchange,
     interval: Interval,
     start: datetime,
     end: datetime
-) -> List[BarData]:
-    """"""
+) -> BarHistory:
+    """
+    Load bar data and keep it cached in columnar format.
+    """
     database: BaseDatabase = get_database()
 
-    return database.load_bar_data(
+    columns: Dict[str, np.ndarray] = database.load_bar_array(
         symbol, exchange, interval, start, end
     )
+    return BarHistory(symbol, exchange, interval, DB_TZ, columns=columns)
 
 
 @lru_cache(maxsize=999)
-def load_tick_data(
+def load_tick_history(
     symbol: str,
     exchange: Exchange,
     start: datetime,
     end: datetime
-) -> List[TickData]:
-    """"""
+) -> TickHistory:
+    """
+    Load tick data and keep it cached in columnar format.
+    """
     database: BaseDatabase = get_database()
 
-    return database.load_tick_data(
+    ticks: List[TickData] = database.load_tick_data(
         symbol, exchange, start, end
     )
+    return TickHistory.from_data(ticks, symbol, exchange)
+
+
+def load_bar_data(
+    symbol: str,
+    exchange: Exchange,
+    interval: Interval,
+    start: datetime,
+    end: datetime
+) -> List[BarData]:
+    """"""
+    return list(load_bar_history(symbol, exchange, interval, start, end))
+
+
+def load_tick_data(
+    symbol: str,
+    exchange: Exchange,
+    start: datetime,
+    end: datetime
+) -> List[TickData]:
+    """"""
+    return list(load_tick_history(symbol, exchange, start, end))
 
 
 def evaluate(
@@ -1584,6 +2952,10 @@ def evaluate(
     capital: int,
     end: datetime,
     mode: BacktestingMode,
+    vectorized: bool,
+    history: HistoryHandle,
+    prune_rules: dict,
+    use_cache: bool,
     setting: dict
 ) -> tuple:
     """
@@ -1605,18 +2977,78 @@ def evaluate(
     )
 
     engine.add_strategy(strategy_class, setting)
-    engine.load_data()
-    engine.run_backtesting()
-    engine.calculate_result()
-    statistics: dict = engine.calculate_statistics(output=False)
+    engine.prune_rules = prune_rules or {}
+
+    # Shared memory is not available to workers on other hosts
+    try:
+        shared: Optional[BaseHistory] = attach_history(history) if history else None
+    except FileNotFoundError:
+        shared = None
+
+    if shared:
+        # Shared history may cover longer range than end of this evaluation
+        engine.set_history_data(shared.truncate(engine.end))
+        source_fingerprint: str = f"{history.fingerprint}|{len(engine.history_data)}"
+    else:
+        # Loaded history is kept by load_bar_history within this process,
+        # so it is identified by load parameters instead of hashing all data
+        engine.load_data()
+        source_fingerprint: str = (
+            f"{engine.vt_symbol}|{engine.interval.value}|{engine.start}|{engine.end}"
+            f"|{len(engine.history_data)}"
+        )
+
+    # Use cached result of same code, parameters and data if enabled
+    key: str = ""
+    if use_cache:
+        if shared:
+            fingerprint: str = history.fingerprint
+        else:
+            fingerprint: str = engine.history_data.get_fingerprint() if engine.history_data else ""
+        key = engine.get_result_key(fingerprint, vectorized)
+
+    result: Optional[dict] = result_cache.get(key) if key else None
+
+    if result:
+        statistics: dict = result["statistics"]
+    else:
+        if vectorized:
+            engine.calculate_vectorized_arrays()
+        else:
+            # Indicator series are shared with later evaluations in this worker
+            engine.set_indicator_source(source_fingerprint)
+            try:
+                engine.run_backtesting()
+            finally:
+                indicator_cache.clear_source()
+            engine.calculate_daily_arrays()
+
+        # Cached result keeps all statistics, otherwise only target is calculated
+        statistics: dict = engine.calculate_statistics_array("" if key else target_name)
+
+        # Result of aborted backtesting is incomplete, so it is not cached
+        if engine.pruned:
+            statistics["prune_reason"] = engine.pruned
+            return (setting, PRUNED_VALUE, statistics)
+
+        if key:
+            result_cache.put(key, engine.get_result(statistics))
 
     target_value: float = statistics[target_name]
     return (setting, target_value, statistics)
 
 
-def wrap_evaluate(engine: BacktestingEngine, target_name: str) -> callable:
+def wrap_evaluate(
+    engine: BacktestingEngine,
+    target_name: str,
+    vectorized: bool = False,
+    history: HistoryHandle = None,
+    end: datetime = None,
+    prune_rules: dict = None
+) -> callable:
     """
-    Wrap evaluate function with given setting from backtesting engine.
+    Wrap evaluate function with given setting from backtesting engine,
+    end of backtesting can be brought forward for a shorter window.
     """
     func: callable = partial(
         evaluate,
@@ -1630,8 +3062,12 @@ def wrap_evaluate(engine: BacktestingEngine, target_name: str) -> callable:
         engine.size,
         engine.pricetick,
         engine.capital,
-        engine.end,
-        engine.mode
+        end or engine.end,
+        engine.mode,
+        vectorized,
+        history,
+        prune_rules,
+        engine.use_cache
     )
     return func
 
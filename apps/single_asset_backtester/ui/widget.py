@@ -24,6 +24,7 @@ from ..engine import (
     EVENT_BACKTESTER_LOG,
     EVENT_BACKTESTER_BACKTESTING_FINISHED,
     EVENT_BACKTESTER_OPTIMIZATION_FINISHED,
+    EVENT_BACKTESTER_OPTIMIZATION_PROGRESS,
     OptimizationSetting
 )
 
@@ -36,6 +37,7 @@ class BacktesterManager(QtWidgets.QWidget):
     signal_log: QtCore.Signal = QtCore.Signal(Event)
     signal_backtesting_finished: QtCore.Signal = QtCore.Signal(Event)
     signal_optimization_finished: QtCore.Signal = QtCore.Signal(Event)
+    signal_optimization_progress: QtCore.Signal = QtCore.Signal(Event)
 
     def __init__(self, main_engine: MainEngine, event_engine: EventEngine) -> None:
         """"""
@@ -106,10 +108,21 @@ class BacktesterManager(QtWidgets.QWidget):
         optimization_button: QtWidgets.QPushButton = QtWidgets.QPushButton("参数优化")
         optimization_button.clicked.connect(self.start_optimization)
 
+        self.stop_button: QtWidgets.QPushButton = QtWidgets.QPushButton("停止优化")
+        self.stop_button.clicked.connect(self.stop_optimization)
+        self.stop_button.setEnabled(False)
+
+        self.optimization_bar: QtWidgets.QProgressBar = QtWidgets.QProgressBar()
+        self.optimization_label: QtWidgets.QLabel = QtWidgets.QLabel()
+        self.optimization_label.setWordWrap(True)
+
         self.result_button: QtWidgets.QPushButton = QtWidgets.QPushButton("优化结果")
         self.result_button.clicked.connect(self.show_optimization_result)
         self.result_button.setEnabled(False)
 
+        stored_button: QtWidgets.QPushButton = QtWidgets.QPushButton("历史优化")
+        stored_button.clicked.connect(self.show_stored_optimization_result)
+
         downloading_button: QtWidgets.QPushButton = QtWidgets.QPushButton("下载数据")
         downloading_button.clicked.connect(self.start_downloading)
 
@@ -140,6 +153,7 @@ class BacktesterManager(QtWidgets.QWidget):
             optimization_button,
             downloading_button,
             self.result_button,
+            stored_button,
             self.order_button,
             self.trade_button,
             self.daily_button,
@@ -175,7 +189,11 @@ class BacktesterManager(QtWidgets.QWidget):
         left_vbox.addLayout(result_grid)
         left_vbox.addStretch()
         left_vbox.addWidget(optimization_button)
+        left_vbox.addWidget(self.stop_button)
+        left_vbox.addWidget(self.optimization_bar)
+        left_vbox.addWidget(self.optimization_label)
         left_vbox.addWidget(self.result_button)
+        left_vbox.addWidget(stored_button)
         left_vbox.addStretch()
         left_vbox.addWidget(edit_button)
         left_vbox.addWidget(reload_button)
@@ -268,10 +286,13 @@ class BacktesterManager(QtWidgets.QWidget):
             self.process_backtesting_finished_event)
         self.signal_optimization_finished.connect(
             self.process_optimization_finished_event)
+        self.signal_optimization_progress.connect(
+            self.process_optimization_progress_event)
 
         self.event_engine.register(EVENT_BACKTESTER_LOG, self.signal_log.emit)
         self.event_engine.register(EVENT_BACKTESTER_BACKTESTING_FINISHED, self.signal_backtesting_finished.emit)
         self.event_engine.register(EVENT_BACKTESTER_OPTIMIZATION_FINISHED, self.signal_optimization_finished.emit)
+        self.event_engine.register(EVENT_BACKTESTER_OPTIMIZATION_PROGRESS, self.signal_optimization_progress.emit)
 
     def process_log_event(self, event: Event) -> None:
         """"""
@@ -305,6 +326,24 @@ class BacktesterManager(QtWidgets.QWidget):
         """"""
         self.write_log("请点击[优化结果]按钮查看")
         self.result_button.setEnabled(True)
+        self.stop_button.setEnabled(False)
+
+    def process_optimization_progress_event(self, event: Event) -> None:
+        """"""
+        progress: dict = event.data
+
+        self.optimization_bar.setRange(0, max(progress["total"], 1))
+        self.optimization_bar.setValue(min(progress["completed"], progress["total"]))
+
+        lines: List[str] = [
+            f"完成：{progress['completed']}/{progress['total']}",
+            f"速度：{progress['speed']:.2f}次/秒",
+            f"剩余：{timedelta(seconds=int(progress['eta']))}"
+        ]
+        for n, (setting, target_value) in enumerate(progress["top"][:5]):
+            lines.append(f"{n + 1}. {target_value:.2f} {setting}")
+
+        self.optimization_label.setText("\n".join(lines))
 
     def start_backtesting(self) -> None:
         """"""
@@ -404,10 +443,10 @@ class BacktesterManager(QtWidgets.QWidget):
         if i != dialog.Accepted:
             return
 
-        optimization_setting, use_ga, max_workers = dialog.get_setting()
+        optimization_setting, algorithm, max_workers = dialog.get_setting()
         self.target_display: str = dialog.target_display
 
-        self.backtester_engine.start_optimization(
+        result: bool = self.backtester_engine.start_optimization(
             class_name,
             vt_symbol,
             interval,
@@ -419,11 +458,21 @@ class BacktesterManager(QtWidgets.QWidget):
             pricetick,
             capital,
             optimization_setting,
-            use_ga,
+            algorithm,
             max_workers
         )
+        if not result:
+            return
 
         self.result_button.setEnabled(False)
+        self.stop_button.setEnabled(True)
+        self.optimization_bar.reset()
+        self.optimization_label.clear()
+
+    def stop_optimization(self) -> None:
+        """"""
+        if self.backtester_engine.stop_optimization():
+            self.stop_button.setEnabled(False)
 
     def start_downloading(self) -> None:
         """"""
@@ -466,6 +515,30 @@ class BacktesterManager(QtWidgets.QWidget):
         )
         dialog.exec_()
 
+    def show_stored_optimization_result(self) -> None:
+        """"""
+        runs: List[dict] = self.backtester_engine.get_optimization_runs()
+        if not runs:
+            self.write_log("结果库中没有已保存的优化任务")
+            return
+
+        run_dialog: OptimizationRunDialog = OptimizationRunDialog(runs)
+        i: int = run_dialog.exec_()
+        if i != run_dialog.Accepted:
+            return
+
+        run: dict = run_dialog.get_run()
+        result_values: list = self.backtester_engine.load_optimization_result(run["run_id"])
+
+        display_map: dict = {v: k for k, v in OptimizationSettingEditor.DISPLAY_NAME_MAP.items()}
+        target_display: str = display_map.get(run["target_name"], run["target_name"])
+
+        dialog: OptimizationResultMonitor = OptimizationResultMonitor(
+            result_values,
+            target_display
+        )
+        dialog.exec_()
+
     def show_backtesting_trades(self) -> None:
         """"""
         if not self.trade_dialog.is_updated():
@@ -852,7 +925,7 @@ class OptimizationSettingEditor(QtWidgets.QDialog):
         self.edits: dict = {}
 
         self.optimization_setting: OptimizationSetting = None
-        self.use_ga: bool = False
+        self.algorithm: str = "bf"
 
         self.init_ui()
 
@@ -910,6 +983,13 @@ class OptimizationSettingEditor(QtWidgets.QDialog):
 
             row += 1
 
+        self.constraint_edit: QtWidgets.QLineEdit = QtWidgets.QLineEdit()
+        self.constraint_edit.setPlaceholderText("例如：fast_window < slow_window; boll_dev * boll_window < 1000")
+        self.constraint_edit.setToolTip("参数约束表达式，多个约束用分号分隔，不满足约束的参数组合不会回测")
+        grid.addWidget(QLabel("参数约束"), row, 0)
+        grid.addWidget(self.constraint_edit, row, 1, 1, 3)
+
+        row += 1
         parallel_button: QtWidgets.QPushButton = QtWidgets.QPushButton("多进程优化")
         parallel_button.clicked.connect(self.generate_parallel_setting)
         grid.addWidget(parallel_button, row, 0, 1, 4)
@@ -919,6 +999,16 @@ class OptimizationSettingEditor(QtWidgets.QDialog):
         ga_button.clicked.connect(self.generate_ga_setting)
         grid.addWidget(ga_button, row, 0, 1, 4)
 
+        row += 1
+        bayes_button: QtWidgets.QPushButton = QtWidgets.QPushButton("贝叶斯优化")
+        bayes_button.clicked.connect(self.generate_bayes_setting)
+        grid.addWidget(bayes_button, row, 0, 1, 4)
+
+        row += 1
+        halving_button: QtWidgets.QPushButton = QtWidgets.QPushButton("逐级淘汰优化")
+        halving_button.clicked.connect(self.generate_halving_setting)
+        grid.addWidget(halving_button, row, 0, 1, 4)
+
         widget: QtWidgets.QWidget = QtWidgets.QWidget()
         widget.setLayout(grid)
 
@@ -932,12 +1022,22 @@ class OptimizationSettingEditor(QtWidgets.QDialog):
 
     def generate_ga_setting(self) -> None:
         """"""
-        self.use_ga: bool = True
+        self.algorithm = "ga"
+        self.generate_setting()
+
+    def generate_bayes_setting(self) -> None:
+        """"""
+        self.algorithm = "bayes"
+        self.generate_setting()
+
+    def generate_halving_setting(self) -> None:
+        """"""
+        self.algorithm = "halving"
         self.generate_setting()
 
     def generate_parallel_setting(self) -> None:
         """"""
-        self.use_ga: bool = False
+        self.algorithm = "bf"
         self.generate_setting()
 
     def generate_setting(self) -> None:
@@ -964,11 +1064,20 @@ class OptimizationSettingEditor(QtWidgets.QDialog):
                     step_value
                 )
 
+        for expression in self.constraint_edit.text().split(";"):
+            if not expression.strip():
+                continue
+
+            success, msg = self.optimization_setting.add_constraint(expression)
+            if not success:
+                QtWidgets.QMessageBox.warning(self, "参数约束错误", msg)
+                return
+
         self.accept()
 
-    def get_setting(self) -> Tuple[OptimizationSetting, bool, int]:
+    def get_setting(self) -> Tuple[OptimizationSetting, str, int]:
         """"""
-        return self.optimization_setting, self.use_ga, self.worker_spin.value()
+        return self.optimization_setting, self.algorithm, self.worker_spin.value()
 
 
 class OptimizationResultMonitor(QtWidgets.QDialog):
@@ -1054,6 +1163,79 @@ class OptimizationResultMonitor(QtWidgets.QDialog):
                 writer.writerow(row_data)
 
 
+class OptimizationRunDialog(QtWidgets.QDialog):
+    """
+    For choosing optimization run saved in result store.
+    """
+
+    def __init__(self, runs: List[dict]) -> None:
+        """"""
+        super().__init__()
+
+        self.runs: List[dict] = runs
+
+        self.init_ui()
+
+    def init_ui(self) -> None:
+        """"""
+        self.setWindowTitle("历史优化任务")
+        self.resize(1100, 500)
+
+        headers: list = ["创建时间", "优化任务", "优化目标", "完成进度", "状态"]
+
+        self.table: QtWidgets.QTableWidget = QtWidgets.QTableWidget()
+        self.table.setColumnCount(len(headers))
+        self.table.setRowCount(len(self.runs))
+        self.table.setHorizontalHeaderLabels(headers)
+        self.table.setEditTriggers(self.table.NoEditTriggers)
+        self.table.setSelectionBehavior(self.table.SelectRows)
+        self.table.setSelectionMode(self.table.SingleSelection)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(
+            QtWidgets.QHeaderView.ResizeToContents
+        )
+        self.table.horizontalHeader().setSectionResizeMode(
+            1, QtWidgets.QHeaderView.Stretch
+        )
+        self.table.cellDoubleClicked.connect(self.accept)
+
+        for n, run in enumerate(self.runs):
+            status: str = "已完成" if run["finished"] else "未完成"
+
+            values: list = [
+                run["created"],
+                run["name"],
+                run["target_name"],
+                f"{run['count']}/{run['total']}",
+                status
+            ]
+
+            for column, value in enumerate(values):
+                cell: QtWidgets.QTableWidgetItem = QtWidgets.QTableWidgetItem(str(value))
+                cell.setTextAlignment(QtCore.Qt.AlignCenter)
+                self.table.setItem(n, column, cell)
+
+        self.table.selectRow(0)
+
+        button: QtWidgets.QPushButton = QtWidgets.QPushButton("打开")
+        button.clicked.connect(self.accept)
+
+        hbox: QtWidgets.QHBoxLayout = QtWidgets.QHBoxLayout()
+        hbox.addStretch()
+        hbox.addWidget(button)
+
+        vbox: QtWidgets.QVBoxLayout = QtWidgets.QVBoxLayout()
+        vbox.addWidget(self.table)
+        vbox.addLayout(hbox)
+
+        self.setLayout(vbox)
+
+    def get_run(self) -> dict:
+        """"""
+        row: int = max(self.table.currentRow(), 0)
+        return self.runs[row]
+
+
 class BacktestingTradeMonitor(BaseMonitor):
     """
     Monitor for backtesting trade data.
@@ -2,20 +2,27 @@
 所用数据库的基类；源自vnpy
 """
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
 from datetime import datetime
 from types import ModuleType
-from typing import List, Optional
+from typing import Dict, Iterator, List, Optional
 from dataclasses import dataclass
 from importlib import import_module
 
+import numpy as np
+
 from trader.constant import Interval, Exchange
 from trader.object import BarData, TickData
+from trader.history import BarHistory
 from trader.setting import SETTINGS
 from trader.utility import ZoneInfo
 
 
 DB_TZ = ZoneInfo(SETTINGS["database.timezone"])
 
+# Number of rows in each chunk yielded by iter_bar_data/iter_tick_data
+ITER_CHUNK_SIZE: int = 10_000
+
 
 def convert_tz(dt: datetime) -> datetime:
     """
@@ -71,6 +78,16 @@ class BaseDatabase(ABC):
         """
         pass
 
+    @contextmanager
+    def bulk_ingest(self, defer_index: bool = False) -> Iterator[None]:
+        """
+        Context for bulk ingest through save_bar_data/save_tick_data.
+
+        Database may override it to relax durability or defer index
+        rebuild during the load in exchange for write speed.
+        """
+        yield
+
     @abstractmethod
     def load_bar_data(
         self,
@@ -85,6 +102,24 @@ class BaseDatabase(ABC):
         """
         pass
 
+    def load_bar_array(
+        self,
+        symbol: str,
+        exchange: Exchange,
+        interval: Interval,
+        start: datetime,
+        end: datetime
+    ) -> Dict[str, np.ndarray]:
+        """
+        Load bar data from database as columns of BarHistory, with datetime
+        column as int64 UTC nanosecond timestamps.
+
+        Default implementation converts result of load_bar_data, database
+        supporting raw query should override it to skip creating data objects.
+        """
+        bars: List[BarData] = self.load_bar_data(symbol, exchange, interval, start, end)
+        return BarHistory.from_data(bars).get_columns()
+
     @abstractmethod
     def load_tick_data(
         self,
@@ -98,6 +133,43 @@ class BaseDatabase(ABC):
         """
         pass
 
+    def iter_bar_data(
+        self,
+        symbol: str,
+        exchange: Exchange,
+        interval: Interval,
+        start: datetime,
+        end: datetime,
+        chunk_size: int = ITER_CHUNK_SIZE
+    ) -> Iterator[List[BarData]]:
+        """
+        Load bar data from database chunk by chunk.
+
+        Default implementation loads all data at once, database supporting
+        cursor should override it to keep memory usage bounded.
+        """
+        bars: List[BarData] = self.load_bar_data(symbol, exchange, interval, start, end)
+        for i in range(0, len(bars), chunk_size):
+            yield bars[i: i + chunk_size]
+
+    def iter_tick_data(
+        self,
+        symbol: str,
+        exchange: Exchange,
+        start: datetime,
+        end: datetime,
+        chunk_size: int = ITER_CHUNK_SIZE
+    ) -> Iterator[List[TickData]]:
+        """
+        Load tick data from database chunk by chunk.
+
+        Default implementation loads all data at once, database supporting
+        cursor should override it to keep memory usage bounded.
+        """
+        ticks: List[TickData] = self.load_tick_data(symbol, exchange, start, end)
+        for i in range(0, len(ticks), chunk_size):
+            yield ticks[i: i + chunk_size]
+
     @abstractmethod
     def delete_bar_data(
         self,
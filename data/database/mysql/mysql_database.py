@@ -1,6 +1,6 @@
 import asyncio
 from datetime import datetime
-from typing import List
+from typing import Iterator, List
 from trader.constant import Exchange, Interval
 from trader.object import BarData, TickData
 from data.database.database import (
@@ -8,12 +8,15 @@ from data.database.database import (
     BarOverview,
     TickOverview,
     DB_TZ,
+    ITER_CHUNK_SIZE,
     convert_tz
 )
 from trader.setting import SETTINGS
 from data.database.schemas import DbBarData, DbTickData, DbBarOverview, DbTickOverview
 from tortoise import Tortoise, run_async
+from tortoise.functions import Count, Max, Min
 from tortoise.queryset import QuerySet
+from tortoise.transactions import in_transaction
 
 user = SETTINGS["database.user"]
 password = SETTINGS["database.password"]
@@ -71,42 +74,55 @@ class MysqlDatabase(BaseDatabase):
                 d.pop("vt_symbol")
                 data.append(d)
 
-            # 使用bulk_create操作将数据更新到数据库中
-            batch_size = 50
-            for chunk in [data[i:i+batch_size] for i in range(0, len(data), batch_size)]:
-                await DbBarData.bulk_create([DbBarData(**item) for item in chunk])
-
-            # 更新K线汇总数据
-            overview: DbBarOverview = await DbBarOverview.filter(
-                symbol=symbol,
-                exchange=exchange.value,
-                interval=interval.value
-            ).first()
-
-            if not overview:
-                overview: DbBarOverview = DbBarOverview(
+            async with in_transaction() as conn:
+                # 写入数据所在时间范围内的数据量
+                queryset: QuerySet = DbBarData.filter(
                     symbol=symbol,
                     exchange=exchange.value,
                     interval=interval.value,
-                    start=bars[0].datetime,
-                    end=bars[-1].datetime,
-                    count=len(bars)
-                )
-            elif stream:
-                overview.end = bars[-1].datetime
-                overview.count += len(bars)
-            else:
-                overview.start = min(bars[0].datetime, overview.start)
-                overview.end = max(bars[-1].datetime, overview.end)
-
-                count: int = await DbBarData.filter(
+                    datetime__gte=min(d["datetime"] for d in data),
+                    datetime__lte=max(d["datetime"] for d in data)
+                ).using_db(conn)
+
+                if not stream:
+                    existing: int = await queryset.count()
+
+                # 使用bulk_create操作将数据更新到数据库中
+                batch_size = 50
+                for chunk in [data[i:i+batch_size] for i in range(0, len(data), batch_size)]:
+                    await DbBarData.bulk_create([DbBarData(**item) for item in chunk], using_db=conn)
+
+                # 统计新插入（非替换）的数据量
+                if stream:
+                    inserted: int = len(bars)
+                else:
+                    inserted: int = await queryset.count() - existing
+
+                # 更新K线汇总数据
+                overview: DbBarOverview = await DbBarOverview.filter(
                     symbol=symbol,
                     exchange=exchange.value,
                     interval=interval.value
-                ).count()
-                overview.count = count
-
-            await overview.save()
+                ).using_db(conn).first()
+
+                if not overview:
+                    overview: DbBarOverview = DbBarOverview(
+                        symbol=symbol,
+                        exchange=exchange.value,
+                        interval=interval.value,
+                        start=bars[0].datetime,
+                        end=bars[-1].datetime,
+                        count=inserted
+                    )
+                elif stream:
+                    overview.end = bars[-1].datetime
+                    overview.count += inserted
+                else:
+                    overview.start = min(bars[0].datetime, overview.start)
+                    overview.end = max(bars[-1].datetime, overview.end)
+                    overview.count += inserted
+
+                await overview.save(using_db=conn)
         run_async(async_func())
         return True
 
@@ -131,39 +147,52 @@ class MysqlDatabase(BaseDatabase):
                 d.pop("vt_symbol")
                 data.append(d)
 
-            # 使用bulk_create操作将数据更新到数据库中
-            batch_size = 50
-            for chunk in [data[i:i + batch_size] for i in range(0, len(data), batch_size)]:
-                await DbTickData.bulk_create([DbTickData(**item) for item in chunk])
-
-            # 更新Tick汇总数据
-            overview: DbTickOverview = await DbTickOverview.filter(
-                symbol=symbol,
-                exchange=exchange.value
-            ).first()
-
-            if not overview:
-                overview: DbTickOverview = DbTickOverview(
+            async with in_transaction() as conn:
+                # 写入数据所在时间范围内的数据量
+                queryset: QuerySet = DbTickData.filter(
                     symbol=symbol,
                     exchange=exchange.value,
-                    start=ticks[0].datetime,
-                    end=ticks[-1].datetime,
-                    count=len(ticks)
-                )
-            elif stream:
-                overview.end = ticks[-1].datetime
-                overview.count += len(ticks)
-            else:
-                overview.start = min(ticks[0].datetime, overview.start)
-                overview.end = max(ticks[-1].datetime, overview.end)
-
-                count: int = await DbTickData.filter(
+                    datetime__gte=min(d["datetime"] for d in data),
+                    datetime__lte=max(d["datetime"] for d in data)
+                ).using_db(conn)
+
+                if not stream:
+                    existing: int = await queryset.count()
+
+                # 使用bulk_create操作将数据更新到数据库中
+                batch_size = 50
+                for chunk in [data[i:i + batch_size] for i in range(0, len(data), batch_size)]:
+                    await DbTickData.bulk_create([DbTickData(**item) for item in chunk], using_db=conn)
+
+                # 统计新插入（非替换）的数据量
+                if stream:
+                    inserted: int = len(ticks)
+                else:
+                    inserted: int = await queryset.count() - existing
+
+                # 更新Tick汇总数据
+                overview: DbTickOverview = await DbTickOverview.filter(
                     symbol=symbol,
                     exchange=exchange.value
-                ).count()
-                overview.count = count
-
-            await overview.save()
+                ).using_db(conn).first()
+
+                if not overview:
+                    overview: DbTickOverview = DbTickOverview(
+                        symbol=symbol,
+                        exchange=exchange.value,
+                        start=ticks[0].datetime,
+                        end=ticks[-1].datetime,
+                        count=inserted
+                    )
+                elif stream:
+                    overview.end = ticks[-1].datetime
+                    overview.count += inserted
+                else:
+                    overview.start = min(ticks[0].datetime, overview.start)
+                    overview.end = max(ticks[-1].datetime, overview.end)
+                    overview.count += inserted
+
+                await overview.save(using_db=conn)
 
         run_async(async_func())
         return True
@@ -177,20 +206,52 @@ class MysqlDatabase(BaseDatabase):
         end: datetime,
     ) -> List[BarData]:
         """"""
-        async def async_func():
+        bars: List[BarData] = []
+        for chunk in self.iter_bar_data(symbol, exchange, interval, start, end):
+            bars.extend(chunk)
+        return bars
 
-            queryset = await (
-                DbBarData.filter(
-                    symbol=symbol,
-                    exchange=exchange.value,
-                    interval=interval.value,
-                    datetime__gte=start,
-                    datetime__lte=end,
-                ).order_by("datetime")
+    def iter_bar_data(
+        self,
+        symbol: str,
+        exchange: Exchange,
+        interval: Interval,
+        start: datetime,
+        end: datetime,
+        chunk_size: int = ITER_CHUNK_SIZE
+    ) -> Iterator[List[BarData]]:
+        """分块读取K线数据，按时间分页查询，每次只读取一块"""
+        async def async_func(last: datetime):
+
+            queryset: QuerySet = DbBarData.filter(
+                symbol=symbol,
+                exchange=exchange.value,
+                interval=interval.value,
+                datetime__lte=end,
             )
 
+            # 以上一块最后一条数据的时间作为下一块的起点
+            if last is None:
+                queryset = queryset.filter(datetime__gte=start)
+            else:
+                queryset = queryset.filter(datetime__gt=last)
+
+            return await queryset.order_by("datetime").limit(chunk_size)
+
+        loop = self.loop
+        last: datetime = None
+
+        while True:
+            future = asyncio.ensure_future(async_func(last), loop=loop)
+            loop.run_until_complete(future)
+            db_bars: list = future.result()
+
+            if not db_bars:
+                break
+            last = db_bars[-1].datetime
+
             bars: List[BarData] = []
-            for db_bar in queryset:
+            for db_bar in db_bars:
                 bar: BarData = BarData(
                     symbol=db_bar.symbol,
                     exchange=Exchange(db_bar.exchange),
@@ -207,11 +268,10 @@ class MysqlDatabase(BaseDatabase):
                 )
                 bars.append(bar)
 
-            return bars
-        loop = self.loop
-        future = asyncio.ensure_future(async_func(), loop=loop)
-        loop.run_until_complete(future)
-        return future.result()
+            yield bars
+
+            if len(db_bars) < chunk_size:
+                break
 
     def load_tick_data(
         self,
@@ -221,19 +281,50 @@ class MysqlDatabase(BaseDatabase):
         end: datetime
     ) -> List[TickData]:
         """读取TICK数据"""
-        async def async_func():
+        ticks: List[TickData] = []
+        for chunk in self.iter_tick_data(symbol, exchange, start, end):
+            ticks.extend(chunk)
+        return ticks
 
-            queryset: QuerySet = (
-                DbTickData.filter(
-                    symbol=symbol,
-                    exchange=exchange.value,
-                    datetime__gte=start,
-                    datetime__lte=end
-                ).order_by("datetime")
+    def iter_tick_data(
+        self,
+        symbol: str,
+        exchange: Exchange,
+        start: datetime,
+        end: datetime,
+        chunk_size: int = ITER_CHUNK_SIZE
+    ) -> Iterator[List[TickData]]:
+        """分块读取TICK数据，按时间分页查询，每次只读取一块"""
+        async def async_func(last: datetime):
+
+            queryset: QuerySet = DbTickData.filter(
+                symbol=symbol,
+                exchange=exchange.value,
+                datetime__lte=end
             )
 
+            # 以上一块最后一条数据的时间作为下一块的起点
+            if last is None:
+                queryset = queryset.filter(datetime__gte=start)
+            else:
+                queryset = queryset.filter(datetime__gt=last)
+
+            return await queryset.order_by("datetime").limit(chunk_size)
+
+        loop = self.loop
+        last: datetime = None
+
+        while True:
+            future = asyncio.ensure_future(async_func(last), loop=loop)
+            loop.run_until_complete(future)
+            db_ticks: list = future.result()
+
+            if not db_ticks:
+                break
+            last = db_ticks[-1].datetime
+
             ticks: List[TickData] = []
-            async for db_tick in queryset:
+            for db_tick in db_ticks:
                 tick: TickData = TickData(
                     symbol=db_tick.symbol,
                     exchange=Exchange(db_tick.exchange),
@@ -275,12 +366,10 @@ class MysqlDatabase(BaseDatabase):
                 )
                 ticks.append(tick)
 
-            return ticks
+            yield ticks
 
-        loop = self.loop
-        future = asyncio.ensure_future(async_func(), loop=loop)
-        loop.run_until_complete(future)
-        return future.result()
+            if len(db_ticks) < chunk_size:
+                break
 
     def delete_bar_data(
         self,
@@ -390,19 +479,16 @@ class MysqlDatabase(BaseDatabase):
     def init_bar_overview(self) -> None:
         async def async_func():
 
-            group_set = set(await DbBarData.all().values_list("symbol", "exchange", "interval"))
-            for group in group_set:
-                symbol, exchange, interval = group
-                queryset: QuerySet = DbBarData.filter(symbol=symbol, exchange=exchange, interval=interval)
-                count = await queryset.count()
-                start: datetime = await queryset.order_by("datetime").first()
-                end: datetime = await queryset.order_by("-datetime").first()
-                await DbBarOverview.create(
-                    symbol=symbol,
-                    exchange=exchange,
-                    interval=interval,
-                    count=count,
-                    start=start,
-                    end=end
-                )
+            # 单次分组查询得到每个合约周期的数量及起止时间
+            groups: List[dict] = await DbBarData.annotate(
+                count=Count("id"),
+                start=Min("datetime"),
+                end=Max("datetime")
+            ).group_by(
+                "symbol", "exchange", "interval"
+            ).values(
+                "symbol", "exchange", "interval", "count", "start", "end"
+            )
+
+            await DbBarOverview.bulk_create([DbBarOverview(**group) for group in groups])
         run_async(async_func())
@@ -3,34 +3,44 @@ sqlite数据库；
 源自vnpy
 """
 
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List
+from itertools import chain
+from sqlite3 import Connection, Cursor, sqlite_version_info
+from typing import Dict, Iterator, List, Tuple
 
+import numpy as np
 from peewee import (
     AutoField,
     CharField,
     DateTimeField,
     FloatField, IntegerField,
+    IntegrityError,
     Model,
     SqliteDatabase as PeeweeSqliteDatabase,
     ModelSelect,
     ModelDelete,
-    chunked,
     fn
 )
 
 from trader.constant import Exchange, Interval
 from trader.object import BarData, TickData
 from trader.utility import get_file_path
+from trader.history import BarHistory, localize_timestamps, to_local_timestamps, to_timestamp
 from data.database.database import (
     BaseDatabase,
     BarOverview,
     DB_TZ,
+    ITER_CHUNK_SIZE,
     TickOverview,
     convert_tz
 )
 
 
+# SQLite单条语句允许的最大变量数量，3.32.0之前为999
+MAX_VARIABLE_NUMBER: int = 32766 if sqlite_version_info >= (3, 32, 0) else 999
+
+
 path: str = str(get_file_path("database.db"))
 db: PeeweeSqliteDatabase = PeeweeSqliteDatabase(path)
 
@@ -145,6 +155,102 @@ class DbTickOverview(Model):
         indexes: tuple = ((("symbol", "exchange"), True),)
 
 
+BAR_ROW_DTYPE: np.dtype = np.dtype(
+    [("datetime", "datetime64[ns]")] + [(name, np.float64) for name in BarHistory.fields]
+)
+
+
+def to_bar_array(rows: List[tuple]) -> Dict[str, np.ndarray]:
+    """将数据库原始行转换为BarHistory列数组，datetime列为UTC纳秒时间戳"""
+    # 一次性解析为结构化数组，数据库中保存的是DB_TZ下不含时区的时间字符串
+    data: np.ndarray = np.array(rows, dtype=BAR_ROW_DTYPE)
+
+    local: np.ndarray = data["datetime"].view(np.int64)
+    columns: Dict[str, np.ndarray] = {"datetime": localize_timestamps(local, DB_TZ)}
+
+    for name in BarHistory.fields:
+        columns[name] = np.ascontiguousarray(data[name])
+
+    return columns
+
+
+BAR_COLUMNS: Tuple[str, ...] = tuple(
+    name for name in DbBarData._meta.sorted_field_names if name != "id"
+)
+TICK_COLUMNS: Tuple[str, ...] = tuple(
+    name for name in DbTickData._meta.sorted_field_names if name != "id"
+)
+
+# 行内需要转换或比较的字段位置
+BAR_DATETIME_IX: int = BAR_COLUMNS.index("datetime")
+TICK_EXCHANGE_IX: int = TICK_COLUMNS.index("exchange")
+TICK_DATETIME_IX: int = TICK_COLUMNS.index("datetime")
+TICK_LOCALTIME_IX: int = TICK_COLUMNS.index("localtime")
+
+
+def to_db_datetimes(dts: List[datetime]) -> List[str]:
+    """批量转换为DB_TZ下不含时区的时间字符串，结果与str(convert_tz(dt))一致"""
+    # 不含时区的时间按系统本地时间处理，与convert_tz一致
+    timestamps: np.ndarray = np.fromiter(
+        (to_timestamp(dt if dt.tzinfo else dt.astimezone()) for dt in dts),
+        np.int64,
+        len(dts)
+    )
+    local: np.ndarray = to_local_timestamps(timestamps, DB_TZ)
+
+    texts: List[str] = [
+        text.replace("T", " ")
+        for text in np.datetime_as_string(local.view("datetime64[ns]"), unit="s").tolist()
+    ]
+
+    # 含微秒的时间单独转换
+    for ix in np.flatnonzero(local % 1_000_000_000).tolist():
+        texts[ix] = str(convert_tz(dts[ix]))
+
+    return texts
+
+
+def to_bar_rows(bars: List[BarData]) -> List[tuple]:
+    """将BarData转换为数据库行，不修改原对象"""
+    dts: List[str] = to_db_datetimes([bar.datetime for bar in bars])
+
+    return [
+        (
+            bar.symbol,
+            bar.exchange.value,
+            dt,
+            bar.interval.value,
+            bar.volume,
+            bar.turnover,
+            bar.open_interest,
+            bar.open_price,
+            bar.high_price,
+            bar.low_price,
+            bar.close_price,
+        )
+        for bar, dt in zip(bars, dts)
+    ]
+
+
+def to_tick_rows(ticks: List[TickData]) -> List[tuple]:
+    """将TickData转换为数据库行，不修改原对象"""
+    dts: List[str] = to_db_datetimes([tick.datetime for tick in ticks])
+
+    rows: List[tuple] = []
+    for tick, dt in zip(ticks, dts):
+        d: dict = tick.__dict__
+        row: list = [d[name] for name in TICK_COLUMNS]
+
+        row[TICK_EXCHANGE_IX] = tick.exchange.value
+        row[TICK_DATETIME_IX] = dt
+        if tick.localtime:
+            row[TICK_LOCALTIME_IX] = str(tick.localtime)
+
+        rows.append(tuple(row))
+
+    return rows
+
+
 class SqliteDatabase(BaseDatabase):
     """SQLite数据库接口"""
 
@@ -154,6 +260,88 @@ class SqliteDatabase(BaseDatabase):
         self.db.connect()
         self.db.create_tables([DbBarData, DbTickData, DbBarOverview, DbTickOverview])
 
+        # 唯一索引被延迟重建期间，写入时不统计新增数量和维护汇总
+        self.index_deferred: bool = False
+
+    @contextmanager
+    def bulk_ingest(self, defer_index: bool = False) -> Iterator[None]:
+        """
+        批量导入模式，期间使用WAL日志并关闭同步写盘，退出时恢复原设置；
+        defer_index为True时先删除行情表唯一索引，期间写入不维护汇总信息，
+        导入完成后去重、重建索引并重新统计全部汇总，适用于向空表或数据较少
+        的表分多批导入大量数据
+        """
+        journal_mode: str = self.db.pragma("journal_mode")
+        synchronous: int = self.db.pragma("synchronous")
+
+        self.db.pragma("journal_mode", "wal")
+        self.db.pragma("synchronous", 0)
+
+        if defer_index:
+            DbBarData._schema.drop_indexes()
+            DbTickData._schema.drop_indexes()
+            self.index_deferred = True
+
+        try:
+            yield
+        finally:
+            # 重建索引失败时也要恢复原设置
+            try:
+                if defer_index:
+                    self.index_deferred = False
+                    self.rebuild_indexes()
+            finally:
+                self.db.pragma("synchronous", synchronous)
+                self.db.pragma("journal_mode", journal_mode)
+
+    def rebuild_indexes(self) -> None:
+        """重建行情表唯一索引，若存在重复数据则保留最后写入的一条，并重新统计汇总信息"""
+        for model, keys in [
+            (DbBarData, "symbol, exchange, interval, datetime"),
+            (DbTickData, "symbol, exchange, datetime")
+        ]:
+            try:
+                with self.db.atomic():
+                    model._schema.create_indexes()
+            except IntegrityError:
+                table: str = model._meta.table_name
+                with self.db.atomic():
+                    self.db.execute_sql(
+                        f"DELETE FROM {table} WHERE id NOT IN "
+                        f"(SELECT MAX(id) FROM {table} GROUP BY {keys})"
+                    )
+                    model._schema.create_indexes()
+
+        # 延迟索引期间未维护汇总，一次分组统计重建
+        with self.db.atomic():
+            DbBarOverview.delete().execute()
+            DbTickOverview.delete().execute()
+            self.init_bar_overview()
+            self.init_tick_overview()
+
+    def insert_rows(self, table: str, columns: Tuple[str, ...], rows: List[tuple]) -> None:
+        """
+        使用INSERT OR REPLACE批量写入数据行，每条语句按SQLite变量上限
+        合并尽可能多的行，同一预编译语句由sqlite3缓存并在executemany中复用
+        """
+        conn: Connection = self.db.connection()
+
+        width: int = len(columns)
+        batch: int = max(MAX_VARIABLE_NUMBER // width, 1)
+
+        head: str = f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES "
+        placeholder: str = "(" + ", ".join("?" * width) + ")"
+
+        full: int = len(rows) // batch * batch
+        if full:
+            conn.executemany(
+                head + ", ".join([placeholder] * batch),
+                (list(chain.from_iterable(rows[i: i + batch])) for i in range(0, full, batch))
+            )
+
+        if full < len(rows):
+            conn.executemany(head + placeholder, rows[full:])
+
     def save_bar_data(self, bars: List[BarData], stream: bool = False) -> bool:
         """保存K线数据"""
         # 读取主键参数
@@ -162,54 +350,62 @@ class SqliteDatabase(BaseDatabase):
         exchange: Exchange = bar.exchange
         interval: Interval = bar.interval
 
-        # 将BarData数据转换为字典，并调整时区
-        data: list = []
+        # 将BarData数据转换为数据库行，并调整时区
+        rows: List[tuple] = to_bar_rows(bars)
 
-        for bar in bars:
-            bar.datetime = convert_tz(bar.datetime)
+        # 延迟索引期间直接写入，汇总信息在重建索引后统一统计
+        if self.index_deferred:
+            with self.db.atomic():
+                self.insert_rows(DbBarData._meta.table_name, BAR_COLUMNS, rows)
+            return True
+        start: datetime = convert_tz(bars[0].datetime)
+        end: datetime = convert_tz(bars[-1].datetime)
 
-            d: dict = bar.__dict__
-            d["exchange"] = d["exchange"].value
-            d["interval"] = d["interval"].value
-            d.pop("gateway_name")
-            d.pop("vt_symbol")
-            data.append(d)
+        # 写入数据所在时间范围内的数据量
+        first: str = min(row[BAR_DATETIME_IX] for row in rows)
+        last: str = max(row[BAR_DATETIME_IX] for row in rows)
 
-        # 使用upsert操作将数据更新到数据库中
-        with self.db.atomic():
-            for c in chunked(data, 50):
-                DbBarData.insert_many(c).on_conflict_replace().execute()
-
-        # 更新K线汇总数据
-        overview: DbBarOverview = DbBarOverview.get_or_none(
-            DbBarOverview.symbol == symbol,
-            DbBarOverview.exchange == exchange.value,
-            DbBarOverview.interval == interval.value,
+        s: ModelSelect = DbBarData.select().where(
+            (DbBarData.symbol == symbol)
+            & (DbBarData.exchange == exchange.value)
+            & (DbBarData.interval == interval.value)
+            & (DbBarData.datetime.between(first, last))
         )
 
-        if not overview:
-            overview = DbBarOverview()
-            overview.symbol = symbol
-            overview.exchange = exchange.value
-            overview.interval = interval.value
-            overview.start = bars[0].datetime
-            overview.end = bars[-1].datetime
-            overview.count = len(bars)
-        elif stream:
-            overview.end = bars[-1].datetime
-            overview.count += len(bars)
-        else:
-            overview.start = min(bars[0].datetime, overview.start)
-            overview.end = max(bars[-1].datetime, overview.end)
-
-            s: ModelSelect = DbBarData.select().where(
-                (DbBarData.symbol == symbol)
-                & (DbBarData.exchange == exchange.value)
-                & (DbBarData.interval == interval.value)
+        with self.db.atomic():
+            # 使用upsert操作将数据更新到数据库中，并统计新插入（非替换）的数据量
+            if stream:
+                self.insert_rows(DbBarData._meta.table_name, BAR_COLUMNS, rows)
+                inserted: int = len(bars)
+            else:
+                existing: int = s.count()
+                self.insert_rows(DbBarData._meta.table_name, BAR_COLUMNS, rows)
+                inserted: int = s.count() - existing
+
+            # 更新K线汇总数据
+            overview: DbBarOverview = DbBarOverview.get_or_none(
+                DbBarOverview.symbol == symbol,
+                DbBarOverview.exchange == exchange.value,
+                DbBarOverview.interval == interval.value,
             )
-            overview.count = s.count()
 
-        overview.save()
+            if not overview:
+                overview = DbBarOverview()
+                overview.symbol = symbol
+                overview.exchange = exchange.value
+                overview.interval = interval.value
+                overview.start = start
+                overview.end = end
+                overview.count = inserted
+            elif stream:
+                overview.end = end
+                overview.count += inserted
+            else:
+                overview.start = min(start, overview.start)
+                overview.end = max(end, overview.end)
+                overview.count += inserted
+
+            overview.save()
 
         return True
 
@@ -220,50 +416,59 @@ class SqliteDatabase(BaseDatabase):
         symbol: str = tick.symbol
         exchange: Exchange = tick.exchange
 
-        # 将TickData数据转换为字典，并调整时区
-        data: list = []
-
-        for tick in ticks:
-            tick.datetime = convert_tz(tick.datetime)
+        # 将TickData数据转换为数据库行，并调整时区
+        rows: List[tuple] = to_tick_rows(ticks)
 
-            d: dict = tick.__dict__
-            d["exchange"] = d["exchange"].value
-            d.pop("gateway_name")
-            d.pop("vt_symbol")
-            data.append(d)
+        # 延迟索引期间直接写入，汇总信息在重建索引后统一统计
+        if self.index_deferred:
+            with self.db.atomic():
+                self.insert_rows(DbTickData._meta.table_name, TICK_COLUMNS, rows)
+            return True
+        start: datetime = convert_tz(ticks[0].datetime)
+        end: datetime = convert_tz(ticks[-1].datetime)
 
-        # 使用upsert操作将数据更新到数据库中
-        with self.db.atomic():
-            for c in chunked(data, 10):
-                DbTickData.insert_many(c).on_conflict_replace().execute()
+        # 写入数据所在时间范围内的数据量
+        first: str = min(row[TICK_DATETIME_IX] for row in rows)
+        last: str = max(row[TICK_DATETIME_IX] for row in rows)
 
-        # 更新Tick汇总数据
-        overview: DbTickOverview = DbTickOverview.get_or_none(
-            DbTickOverview.symbol == symbol,
-            DbTickOverview.exchange == exchange.value,
+        s: ModelSelect = DbTickData.select().where(
+            (DbTickData.symbol == symbol)
+            & (DbTickData.exchange == exchange.value)
+            & (DbTickData.datetime.between(first, last))
         )
 
-        if not overview:
-            overview: DbTickOverview = DbTickOverview()
-            overview.symbol = symbol
-            overview.exchange = exchange.value
-            overview.start = ticks[0].datetime
-            overview.end = ticks[-1].datetime
-            overview.count = len(ticks)
-        elif stream:
-            overview.end = ticks[-1].datetime
-            overview.count += len(ticks)
-        else:
-            overview.start = min(ticks[0].datetime, overview.start)
-            overview.end = max(ticks[-1].datetime, overview.end)
-
-            s: ModelSelect = DbTickData.select().where(
-                (DbTickData.symbol == symbol)
-                & (DbTickData.exchange == exchange.value)
+        with self.db.atomic():
+            # 使用upsert操作将数据更新到数据库中，并统计新插入（非替换）的数据量
+            if stream:
+                self.insert_rows(DbTickData._meta.table_name, TICK_COLUMNS, rows)
+                inserted: int = len(ticks)
+            else:
+                existing: int = s.count()
+                self.insert_rows(DbTickData._meta.table_name, TICK_COLUMNS, rows)
+                inserted: int = s.count() - existing
+
+            # 更新Tick汇总数据
+            overview: DbTickOverview = DbTickOverview.get_or_none(
+                DbTickOverview.symbol == symbol,
+                DbTickOverview.exchange == exchange.value,
             )
-            overview.count = s.count()
 
-        overview.save()
+            if not overview:
+                overview: DbTickOverview = DbTickOverview()
+                overview.symbol = symbol
+                overview.exchange = exchange.value
+                overview.start = start
+                overview.end = end
+                overview.count = inserted
+            elif stream:
+                overview.end = end
+                overview.count += inserted
+            else:
+                overview.start = min(start, overview.start)
+                overview.end = max(end, overview.end)
+                overview.count += inserted
+
+            overview.save()
 
         return True
 
@@ -276,35 +481,60 @@ class SqliteDatabase(BaseDatabase):
         end: datetime
     ) -> List[BarData]:
         """读取K线数据"""
-        s: ModelSelect = (
-            DbBarData.select().where(
-                (DbBarData.symbol == symbol)
-                & (DbBarData.exchange == exchange.value)
-                & (DbBarData.interval == interval.value)
-                & (DbBarData.datetime >= start)
-                & (DbBarData.datetime <= end)
-            ).order_by(DbBarData.datetime)
+        columns: Dict[str, np.ndarray] = self.load_bar_array(symbol, exchange, interval, start, end)
+        return list(BarHistory(symbol, exchange, interval, DB_TZ, columns=columns))
+
+    def load_bar_array(
+        self,
+        symbol: str,
+        exchange: Exchange,
+        interval: Interval,
+        start: datetime,
+        end: datetime
+    ) -> Dict[str, np.ndarray]:
+        """读取K线数据为列数组，跳过ORM直接使用sqlite3游标查询所需字段"""
+        cursor: Cursor = self.select_bar_rows(symbol, exchange, interval, start, end)
+        return to_bar_array(cursor.fetchall())
+
+    def select_bar_rows(
+        self,
+        symbol: str,
+        exchange: Exchange,
+        interval: Interval,
+        start: datetime,
+        end: datetime
+    ) -> Cursor:
+        """执行K线原始查询，返回按时间排序的datetime及BarHistory字段"""
+        fields: str = ", ".join(BarHistory.fields)
+        sql: str = (
+            f"SELECT datetime, {fields} FROM {DbBarData._meta.table_name} "
+            "WHERE symbol = ? AND exchange = ? AND interval = ? "
+            "AND datetime >= ? AND datetime <= ? "
+            "ORDER BY datetime"
         )
+        params: tuple = (symbol, exchange.value, interval.value, str(start), str(end))
 
-        bars: List[BarData] = []
-        for db_bar in s:
-            bar: BarData = BarData(
-                symbol=db_bar.symbol,
-                exchange=Exchange(db_bar.exchange),
-                datetime=datetime.fromtimestamp(db_bar.datetime.timestamp(), DB_TZ),
-                interval=Interval(db_bar.interval),
-                volume=db_bar.volume,
-                turnover=db_bar.turnover,
-                open_interest=db_bar.open_interest,
-                open_price=db_bar.open_price,
-                high_price=db_bar.high_price,
-                low_price=db_bar.low_price,
-                close_price=db_bar.close_price,
-                gateway_name="DB"
-            )
-            bars.append(bar)
+        return self.db.execute_sql(sql, params)
 
-        return bars
+    def iter_bar_data(
+        self,
+        symbol: str,
+        exchange: Exchange,
+        interval: Interval,
+        start: datetime,
+        end: datetime,
+        chunk_size: int = ITER_CHUNK_SIZE
+    ) -> Iterator[List[BarData]]:
+        """分块读取K线数据，使用游标分块读取，内存占用不随数据量增长"""
+        cursor: Cursor = self.select_bar_rows(symbol, exchange, interval, start, end)
+
+        while True:
+            rows: List[tuple] = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+
+            columns: Dict[str, np.ndarray] = to_bar_array(rows)
+            yield list(BarHistory(symbol, exchange, interval, DB_TZ, columns=columns))
 
     def load_tick_data(
         self,
@@ -314,6 +544,20 @@ class SqliteDatabase(BaseDatabase):
         end: datetime
     ) -> List[TickData]:
         """读取TICK数据"""
+        ticks: List[TickData] = []
+        for chunk in self.iter_tick_data(symbol, exchange, start, end):
+            ticks.extend(chunk)
+        return ticks
+
+    def iter_tick_data(
+        self,
+        symbol: str,
+        exchange: Exchange,
+        start: datetime,
+        end: datetime,
+        chunk_size: int = ITER_CHUNK_SIZE
+    ) -> Iterator[List[TickData]]:
+        """分块读取TICK数据，使用游标逐行读取，内存占用不随数据量增长"""
         s: ModelSelect = (
             DbTickData.select().where(
                 (DbTickData.symbol == symbol)
@@ -324,7 +568,7 @@ class SqliteDatabase(BaseDatabase):
         )
 
         ticks: List[TickData] = []
-        for db_tick in s:
+        for db_tick in s.iterator():
             tick: TickData = TickData(
                 symbol=db_tick.symbol,
                 exchange=Exchange(db_tick.exchange),
@@ -366,7 +610,12 @@ class SqliteDatabase(BaseDatabase):
             )
             ticks.append(tick)
 
-        return ticks
+            if len(ticks) == chunk_size:
+                yield ticks
+                ticks = []
+
+        if ticks:
+            yield ticks
 
     def delete_bar_data(
         self,
@@ -445,43 +694,35 @@ class SqliteDatabase(BaseDatabase):
                 DbBarData.symbol,
                 DbBarData.exchange,
                 DbBarData.interval,
-                fn.COUNT(DbBarData.id).alias("count")
+                fn.COUNT(DbBarData.id).alias("count"),
+                fn.MIN(DbBarData.datetime).alias("start"),
+                fn.MAX(DbBarData.datetime).alias("end")
             ).group_by(
                 DbBarData.symbol,
                 DbBarData.exchange,
                 DbBarData.interval
-            )
+            ).dicts()
         )
 
-        for data in s:
-            overview: DbBarOverview = DbBarOverview()
-            overview.symbol = data.symbol
-            overview.exchange = data.exchange
-            overview.interval = data.interval
-            overview.count = data.count
-
-            start_bar: DbBarData = (
-                DbBarData.select()
-                .where(
-                    (DbBarData.symbol == data.symbol)
-                    & (DbBarData.exchange == data.exchange)
-                    & (DbBarData.interval == data.interval)
-                )
-                .order_by(DbBarData.datetime.asc())
-                .first()
-            )
-            overview.start = start_bar.datetime
-
-            end_bar: DbBarData = (
-                DbBarData.select()
-                .where(
-                    (DbBarData.symbol == data.symbol)
-                    & (DbBarData.exchange == data.exchange)
-                    & (DbBarData.interval == data.interval)
-                )
-                .order_by(DbBarData.datetime.desc())
-                .first()
-            )
-            overview.end = end_bar.datetime
+        with self.db.atomic():
+            for data in s:
+                DbBarOverview.create(**data)
 
-            overview.save()
+    def init_tick_overview(self) -> None:
+        """初始化数据库中的Tick汇总信息"""
+        s: ModelSelect = (
+            DbTickData.select(
+                DbTickData.symbol,
+                DbTickData.exchange,
+                fn.COUNT(DbTickData.id).alias("count"),
+                fn.MIN(DbTickData.datetime).alias("start"),
+                fn.MAX(DbTickData.datetime).alias("end")
+            ).group_by(
+                DbTickData.symbol,
+                DbTickData.exchange
+            ).dicts()
+        )
+
+        with self.db.atomic():
+            for data in s:
+                DbTickOverview.create(**data)
@@ -0,0 +1,103 @@
+"""
+分布式优化自检：生成随机K线存入数据库，在本机启动协调进程与工作进程，
+确认结果与本地进程池穷举优化一致，结束后删除生成的数据。
+
+在项目根目录运行：python -m example.distributed_optimization
+"""
+
+from datetime import datetime
+
+import numpy as np
+
+from apps.single_asset_backtester.engine import BacktestingEngine
+from data.database.database import DB_TZ, BaseDatabase, get_database
+from optimizer.distributed import DistributedExecutor, start_workers
+from optimizer.optimize import OptimizationSetting
+from strategies.double_ma_strategy import DoubleMaStrategy
+from trader.constant import Exchange, Interval
+from trader.history import BarHistory, to_timestamp
+
+
+SYMBOL: str = "DISTDEMO"
+EXCHANGE: Exchange = Exchange.LOCAL
+
+
+def create_history(size: int = 20000) -> BarHistory:
+    """生成随机游走分钟K线"""
+    rng = np.random.default_rng(1)
+    close = np.round(100 + np.cumsum(rng.normal(0, 0.3, size)), 2)
+    open_ = np.concatenate([close[:1], close[:-1]])
+
+    start = to_timestamp(datetime(2022, 1, 3, 9, tzinfo=DB_TZ))
+    columns: dict = {
+        "datetime": start + np.arange(size, dtype=np.int64) * 60_000_000_000,
+        "volume": np.ones(size),
+        "turnover": np.zeros(size),
+        "open_interest": np.zeros(size),
+        "open_price": open_,
+        "high_price": np.round(np.maximum(open_, close) + np.abs(rng.normal(0, 0.1, size)), 2),
+        "low_price": np.round(np.minimum(open_, close) - np.abs(rng.normal(0, 0.1, size)), 2),
+        "close_price": close,
+    }
+    return BarHistory(SYMBOL, EXCHANGE, Interval.MINUTE, DB_TZ, columns=columns)
+
+
+def main() -> None:
+    # 优化时引擎从数据库加载历史数据，因此先写入生成的K线
+    database: BaseDatabase = get_database()
+    database.delete_bar_data(SYMBOL, EXCHANGE, Interval.MINUTE)
+    database.save_bar_data(list(create_history()))
+
+    try:
+        run_optimizations()
+    finally:
+        database.delete_bar_data(SYMBOL, EXCHANGE, Interval.MINUTE)
+
+
+def run_optimizations() -> None:
+    engine = BacktestingEngine()
+    engine.set_parameters(
+        vt_symbol=f"{SYMBOL}.{EXCHANGE.value}",
+        interval=Interval.MINUTE,
+        start=datetime(2022, 1, 1),
+        rate=0.0003,
+        slippage=0.01,
+        size=10,
+        pricetick=0.01,
+        capital=1_000_000,
+        end=datetime(2023, 1, 1)
+    )
+    engine.add_strategy(DoubleMaStrategy, {})
+
+    setting = OptimizationSetting()
+    setting.add_parameter("fast_window", 5, 20, 5)
+    setting.add_parameter("slow_window", 30, 60, 10)
+    setting.set_target("total_net_pnl")
+
+    local_results = engine.run_bf_optimization(setting, output=False, max_workers=2)
+
+    # 协调进程仅监听本机，端口由系统分配，认证密钥随机生成
+    executor = DistributedExecutor(("127.0.0.1", 0))
+    processes = start_workers(executor.address, executor.authkey, 2)
+    try:
+        distributed_results = engine.run_bf_optimization(
+            setting,
+            output=False,
+            max_workers=2,
+            executor=executor
+        )
+    finally:
+        executor.shutdown()
+        for p in processes:
+            p.join()
+
+    # 目标值相同的参数排序不固定，按参数比较
+    local = sorted(((s, v) for s, v, _ in local_results), key=str)
+    distributed = sorted(((s, v) for s, v, _ in distributed_results), key=str)
+    assert len({v for _, v in local}) > 1, "各参数优化目标相同，无法验证结果"
+    assert local == distributed, "分布式优化结果与本地优化不一致"
+    print(f"分布式优化结果与本地优化一致，参数组合数量：{len(local)}")
+
+
+if __name__ == "__main__":
+    main()
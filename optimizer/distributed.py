@@ -0,0 +1,344 @@
+"""
+Distributed optimization through a local TCP task broker.
+
+Coordinator serves chunks of settings with DistributedExecutor, which can be
+passed to run_bf_optimization as an alternate executor. Workers on any host
+pull chunks, run evaluation and push results back:
+
+    python -m optimizer.distributed --host 192.168.1.2 --port 5210 --authkey <hex> --workers 8
+
+Messages are pickled, so anyone able to connect with the authkey can run code
+on both sides. Coordinator listens on localhost unless given another address,
+and generates a random authkey when none is given. Only bind to an address
+reachable from trusted hosts.
+"""
+
+import secrets
+import traceback
+from argparse import ArgumentParser
+from collections import deque
+from concurrent.futures import Executor, Future, InvalidStateError
+from multiprocessing import get_context
+from multiprocessing.connection import Client, Connection, Listener
+from multiprocessing.process import BaseProcess
+from os import cpu_count
+from threading import Condition, Event, Lock, Thread
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Set, Tuple
+
+from optimizer.optimize import WORKER_MODULES, init_worker, iter_chunks
+
+
+class DistributedTask:
+    """
+    Chunk of function calls dispatched to one worker.
+    """
+
+    def __init__(self, task_id: int, func: Callable, items: List[tuple]) -> None:
+        """"""
+        self.task_id: int = task_id
+        self.func: Callable = func
+        self.items: List[tuple] = items
+        self.future: Future = Future()
+
+
+class DistributedExecutor(Executor):
+    """
+    Executor serving tasks to remote workers over TCP.
+
+    Workers send heartbeats while running a chunk. If a worker disconnects
+    or stays silent longer than heartbeat_timeout, its chunks are put back
+    into queue for other workers.
+
+    Without authkey given, a random one is generated and printed in hex for
+    starting workers with.
+    """
+
+    def __init__(
+        self,
+        address: Tuple[str, int] = ("127.0.0.1", 5210),
+        authkey: bytes = None,
+        heartbeat_interval: float = 5,
+        heartbeat_timeout: float = 30
+    ) -> None:
+        """"""
+        if not authkey:
+            authkey = secrets.token_bytes(32)
+            print(f"分布式优化认证密钥：{authkey.hex()}")
+
+        self.authkey: bytes = authkey
+        self.heartbeat_interval: float = heartbeat_interval
+        self.heartbeat_timeout: float = heartbeat_timeout
+
+        self.condition: Condition = Condition()
+        self.queue: Deque[DistributedTask] = deque()
+        self.tasks: Dict[int, DistributedTask] = {}
+        self.task_count: int = 0
+        self.stopped: bool = False
+
+        self.listener: Listener = Listener(address, authkey=authkey)
+        self.address: Tuple[str, int] = self.listener.address
+
+        self.thread: Thread = Thread(target=self.run_listener, daemon=True)
+        self.thread.start()
+
+    def run_listener(self) -> None:
+        """
+        Accept worker connections until shutdown.
+        """
+        while not self.stopped:
+            try:
+                conn: Connection = self.listener.accept()
+            except Exception:
+                continue
+
+            Thread(target=self.serve_worker, args=(conn,), daemon=True).start()
+
+    def serve_worker(self, conn: Connection) -> None:
+        """
+        Serve one worker connection, requeue its tasks if it is lost.
+        """
+        assigned: Set[int] = set()
+
+        try:
+            while True:
+                if not conn.poll(self.heartbeat_timeout):
+                    break
+
+                msg: tuple = conn.recv()
+                command: str = msg[0]
+
+                if command == "get":
+                    task: DistributedTask = self.get_task()
+                    if task:
+                        assigned.add(task.task_id)
+                        conn.send(("task", task.task_id, task.func, task.items))
+                    elif self.stopped:
+                        conn.send(("stop",))
+                        break
+                    else:
+                        conn.send(("wait",))
+                elif command == "result":
+                    assigned.discard(msg[1])
+                    self.finish_task(msg[1], msg[2], None)
+                elif command == "error":
+                    assigned.discard(msg[1])
+                    self.finish_task(msg[1], None, RuntimeError(msg[2]))
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+            self.requeue_tasks(assigned)
+
+    def get_task(self) -> DistributedTask:
+        """
+        Wait for next task, return None if there is none within heartbeat interval.
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.queue or self.stopped, self.heartbeat_interval)
+
+            while self.queue:
+                task: DistributedTask = self.queue.popleft()
+                if not task.future.done():
+                    return task
+
+                # Drop task cancelled before dispatch
+                self.tasks.pop(task.task_id, None)
+
+        return None
+
+    def finish_task(self, task_id: int, results: list, exception: Exception) -> None:
+        """"""
+        with self.condition:
+            task: DistributedTask = self.tasks.pop(task_id, None)
+
+        # Task may be finished already by another worker after being requeued
+        if not task or task.future.done():
+            return
+
+        try:
+            if exception:
+                task.future.set_exception(exception)
+            else:
+                task.future.set_result(results)
+        except InvalidStateError:
+            pass
+
+    def requeue_tasks(self, task_ids: Iterable[int]) -> None:
+        """"""
+        with self.condition:
+            for task_id in task_ids:
+                task: DistributedTask = self.tasks.get(task_id, None)
+                if task and not task.future.done():
+                    self.queue.appendleft(task)
+
+            self.condition.notify_all()
+
+    def submit_chunk(self, func: Callable, items: List[tuple]) -> Future:
+        """
+        Put chunk of calls into queue, return future of their results.
+        """
+        with self.condition:
+            if self.stopped:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+
+            self.task_count += 1
+            task: DistributedTask = DistributedTask(self.task_count, func, items)
+
+            self.tasks[task.task_id] = task
+            self.queue.append(task)
+            self.condition.notify()
+
+        return task.future
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> Future:
+        """"""
+        if kwargs:
+            raise ValueError("keyword arguments are not supported")
+
+        future: Future = Future()
+
+        def set_result(chunk_future: Future) -> None:
+            """"""
+            if chunk_future.cancelled():
+                future.cancel()
+            elif chunk_future.exception():
+                future.set_exception(chunk_future.exception())
+            else:
+                future.set_result(chunk_future.result()[0])
+
+        self.submit_chunk(fn, [args]).add_done_callback(set_result)
+        return future
+
+    def map(self, fn: Callable, *iterables, timeout: float = None, chunksize: int = 1) -> Iterator:
+        """
+        Return results in the same order as inputs, like ProcessPoolExecutor.map.
+        """
+        futures: List[Future] = [
+            self.submit_chunk(fn, chunk)
+            for chunk in iter_chunks(zip(*iterables), chunksize)
+        ]
+
+        def iter_results() -> Iterator:
+            """"""
+            try:
+                for future in futures:
+                    yield from future.result(timeout)
+            finally:
+                for future in futures:
+                    future.cancel()
+
+        return iter_results()
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        """
+        Stop accepting new tasks, connected workers receive stop once queue is empty.
+        """
+        with self.condition:
+            self.stopped = True
+
+            if cancel_futures:
+                for task in self.queue:
+                    task.future.cancel()
+                self.queue.clear()
+
+            self.condition.notify_all()
+
+        self.listener.close()
+
+
+def run_worker(
+    address: Tuple[str, int],
+    authkey: bytes,
+    heartbeat_interval: float = 5
+) -> None:
+    """
+    Pull tasks from coordinator and run them until asked to stop.
+    """
+    init_worker(WORKER_MODULES)
+
+    conn: Connection = Client(tuple(address), authkey=authkey)
+    lock: Lock = Lock()
+    stop: Event = Event()
+
+    def send(msg: tuple) -> None:
+        """"""
+        with lock:
+            conn.send(msg)
+
+    def send_heartbeat() -> None:
+        """"""
+        while not stop.wait(heartbeat_interval):
+            try:
+                send(("heartbeat",))
+            except OSError:
+                return
+
+    Thread(target=send_heartbeat, daemon=True).start()
+
+    try:
+        while True:
+            send(("get",))
+            msg: tuple = conn.recv()
+
+            if msg[0] == "stop":
+                break
+            elif msg[0] == "wait":
+                continue
+
+            _, task_id, func, items = msg
+            try:
+                results: list = [func(*args) for args in items]
+                send(("result", task_id, results))
+            except Exception:
+                send(("error", task_id, traceback.format_exc()))
+    except (EOFError, OSError):
+        pass
+    finally:
+        stop.set()
+        conn.close()
+
+
+def start_workers(
+    address: Tuple[str, int],
+    authkey: bytes,
+    count: int = None,
+    heartbeat_interval: float = 5
+) -> List[BaseProcess]:
+    """
+    Start worker processes on this host.
+    """
+    count = count or cpu_count() or 1
+
+    processes: List[BaseProcess] = []
+    for _ in range(count):
+        p: BaseProcess = get_context("spawn").Process(
+            target=run_worker,
+            args=(address, authkey, heartbeat_interval),
+            daemon=True
+        )
+        p.start()
+        processes.append(p)
+
+    return processes
+
+
+def main() -> None:
+    """"""
+    parser: ArgumentParser = ArgumentParser(description="分布式参数优化工作进程")
+    parser.add_argument("--host", default="127.0.0.1", help="协调进程地址")
+    parser.add_argument("--port", type=int, default=5210, help="协调进程端口")
+    parser.add_argument("--authkey", required=True, type=bytes.fromhex, help="连接认证密钥（十六进制）")
+    parser.add_argument("--workers", type=int, default=0, help="工作进程数量，0则使用CPU核心数")
+    args = parser.parse_args()
+
+    processes: List[BaseProcess] = start_workers(
+        (args.host, args.port),
+        args.authkey,
+        args.workers
+    )
+    for p in processes:
+        p.join()
+
+
+if __name__ == "__main__":
+    main()
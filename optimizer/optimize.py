@@ -2,29 +2,161 @@
 源自vnpy
 """
 
-from typing import Dict, List, Callable, Tuple
-from itertools import product
+import json
+import pickle
+import sqlite3
+from typing import Dict, List, Callable, Tuple, Iterator, Sequence, Set, Union
+from itertools import product, islice
+from heapq import nlargest, heappush, heapreplace
+from math import ceil
+from contextlib import ExitStack
+from importlib import import_module
 from concurrent.futures import ProcessPoolExecutor
-from random import random, choice
+from random import random, randrange
+from os import cpu_count
 from time import perf_counter
+from datetime import datetime, date
+from pathlib import Path
 from multiprocessing import get_context
-from multiprocessing.context import BaseContext
-from _collections_abc import dict_keys, dict_values, Iterable
+from threading import Event
+from _collections_abc import Iterable
 
+import numpy as np
 from tqdm import tqdm
 from deap import creator, base, tools, algorithms
 
 
 OUTPUT_FUNC = Callable[[str], None]
+CONSTRAINT_FUNC = Callable[[dict], bool]
+PROGRESS_FUNC = Callable[[dict], None]
 EVALUATE_FUNC = Callable[[dict], dict]
 KEY_FUNC = Callable[[list], float]
 
 
+# Target value of setting whose backtesting is aborted by pruning rules
+PRUNED_VALUE: float = float("-inf")
+
+# Supported pruning rules checked periodically during backtesting replay
+PRUNE_RULES: Dict[str, str] = {
+    "max_ddpercent": "最大百分比回撤",
+    "min_balance": "最低资金",
+    "min_trade_count": "最少成交笔数",
+}
+
+
+# Builtin functions available in constraint expressions. Hiding other builtins
+# does not make eval safe, so expressions must come from trusted input
+CONSTRAINT_BUILTINS: dict = {"abs": abs, "min": min, "max": max, "round": round}
+
+
+# Modules imported once by every worker process when it starts
+WORKER_MODULES: List[str] = ["numpy", "pandas", "talib", "deap"]
+
+
 # Create individual class used in genetic algorithm optimization
 creator.create("FitnessMax", base.Fitness, weights=(1.0,))
 creator.create("Individual", list, fitness=creator.FitnessMax)
 
 
+class SettingSpace(Sequence):
+    """
+    Lazy cartesian product of parameter values.
+
+    Settings are generated on demand, the i-th setting is decoded from index
+    with mixed radix, where the last parameter varies fastest same as product.
+
+    Indexing and length cover the whole grid, settings violating constraints
+    are only skipped by iter_valid and check.
+    """
+
+    def __init__(self, params: Dict[str, List], constraints: List[CONSTRAINT_FUNC] = None) -> None:
+        """"""
+        self.keys: List[str] = list(params.keys())
+        self.values: List[List] = [list(v) for v in params.values()]
+        self.constraints: List[CONSTRAINT_FUNC] = constraints or []
+
+        self.size: int = 1
+        for v in self.values:
+            self.size *= len(v)
+
+        self.valid_size: int = None
+
+    def __len__(self) -> int:
+        """"""
+        return self.size
+
+    def __getitem__(self, ix: Union[int, slice]) -> Union[dict, List[dict]]:
+        """"""
+        if isinstance(ix, slice):
+            return [self[i] for i in range(*ix.indices(self.size))]
+
+        if ix < 0:
+            ix += self.size
+        if not 0 <= ix < self.size:
+            raise IndexError("setting index out of range")
+
+        # Decode index from the last parameter to the first
+        combination: list = []
+        for v in reversed(self.values):
+            ix, r = divmod(ix, len(v))
+            combination.append(v[r])
+
+        return dict(zip(self.keys, reversed(combination)))
+
+    def __iter__(self) -> Iterator[dict]:
+        """"""
+        keys: List[str] = self.keys
+        for p in product(*self.values):
+            yield dict(zip(keys, p))
+
+    def index(self, setting: dict) -> int:
+        """
+        Return index of given setting, raise ValueError if not in space.
+        """
+        ix: int = 0
+        for key, v in zip(self.keys, self.values):
+            ix = ix * len(v) + v.index(setting[key])
+        return ix
+
+    def check(self, setting: dict) -> bool:
+        """
+        Return whether setting satisfies all constraints.
+        """
+        for constraint in self.constraints:
+            if not constraint(setting):
+                return False
+        return True
+
+    def iter_valid(self) -> Iterator[dict]:
+        """
+        Iterate settings satisfying all constraints.
+        """
+        if not self.constraints:
+            return iter(self)
+        return filter(self.check, self)
+
+    def count_valid(self) -> int:
+        """
+        Count settings satisfying all constraints, cached after first scan.
+        """
+        if self.valid_size is None:
+            if not self.constraints:
+                self.valid_size = self.size
+            else:
+                self.valid_size = sum(1 for _ in self.iter_valid())
+        return self.valid_size
+
+    def get_info(self) -> str:
+        """
+        Return description of space size with count pruned by constraints.
+        """
+        if not self.constraints:
+            return f"参数优化空间：{self.size}"
+
+        pruned: int = self.size - self.count_valid()
+        return f"参数优化空间：{self.valid_size}（约束剪除{pruned}）"
+
+
 class OptimizationSetting:
     """
     Setting for runnning optimization.
@@ -34,6 +166,10 @@ class OptimizationSetting:
         """"""
         self.params: Dict[str, List] = {}
         self.target_name: str = ""
+        self.prune_rules: dict = {}
+        self.constraints: List[Tuple[str, CONSTRAINT_FUNC]] = []
+
+        self.settings: SettingSpace = None
 
     def add_parameter(
         self,
@@ -45,6 +181,7 @@ class OptimizationSetting:
         """"""
         if end is None and step is None:
             self.params[name] = [start]
+            self.settings = None
             return True, "固定参数添加成功"
 
         if start >= end:
@@ -61,25 +198,347 @@ class OptimizationSetting:
             value += step
 
         self.params[name] = value_list
+        self.settings = None
 
         return True, f"范围参数添加成功，数量{len(value_list)}"
 
+    def add_prune_rule(
+        self,
+        name: str,
+        value: float,
+        deadline: Union[datetime, date] = None
+    ) -> Tuple[bool, str]:
+        """
+        Add rule to abort hopeless backtesting early:
+
+        * max_ddpercent: drawdown from peak equity in percent exceeds value
+        * min_balance: equity falls below value
+        * min_trade_count: trade count is still below value at deadline
+        """
+        if name not in PRUNE_RULES:
+            return False, f"不支持的剪枝规则{name}"
+
+        if name == "min_trade_count":
+            if not deadline:
+                return False, "最少成交笔数规则必须设置截止时间"
+
+            if not isinstance(deadline, datetime):
+                deadline = datetime.combine(deadline, datetime.min.time())
+            self.prune_rules[name] = (deadline.replace(tzinfo=None), value)
+        else:
+            self.prune_rules[name] = abs(value) if name == "max_ddpercent" else value
+
+        return True, f"剪枝规则添加成功：{PRUNE_RULES[name]}"
+
+    def add_constraint(self, constraint: Union[str, CONSTRAINT_FUNC]) -> Tuple[bool, str]:
+        """
+        Add constraint which every setting to evaluate must satisfy, either
+        a function taking setting dict or an expression of parameter names
+        like "fast_window < slow_window".
+
+        Expressions are evaluated with eval, so they must be as trusted as
+        strategy code.
+        """
+        if callable(constraint):
+            name: str = getattr(constraint, "__qualname__", repr(constraint))
+            self.constraints.append((name, constraint))
+            self.settings = None
+            return True, f"参数约束添加成功：{name}"
+
+        expression: str = constraint.strip()
+        try:
+            code = compile(expression, "<constraint>", "eval")
+        except SyntaxError:
+            return False, f"参数约束表达式语法错误：{expression}"
+
+        def check_expression(setting: dict) -> bool:
+            """"""
+            return bool(eval(code, {"__builtins__": CONSTRAINT_BUILTINS}, setting))
+
+        self.constraints.append((expression, check_expression))
+        self.settings = None
+        return True, f"参数约束添加成功：{expression}"
+
     def set_target(self, target_name: str) -> None:
         """"""
         self.target_name = target_name
 
-    def generate_settings(self) -> List[dict]:
+    def generate_settings(self) -> SettingSpace:
+        """
+        Return lazy sequence of all parameter combinations, kept until
+        parameters or constraints change so that valid count is scanned once.
+        """
+        if self.settings is None:
+            self.settings = SettingSpace(self.params, [func for _, func in self.constraints])
+        return self.settings
+
+
+def get_setting_key(setting: dict) -> str:
+    """
+    Return canonical string key of parameter setting.
+    """
+    return json.dumps(setting, sort_keys=True, default=str)
+
+
+class ResultStore:
+    """
+    Local SQLite store of optimization results keyed by run id.
+
+    Every finished (setting, target, statistics) tuple is committed as soon as
+    possible, so that an interrupted run can be resumed by skipping settings
+    already stored, and a finished run can be opened without recomputing.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        """"""
+        self.path: str = str(path)
+
+        self.db: sqlite3.Connection = sqlite3.connect(self.path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS run ("
+            "run_id TEXT PRIMARY KEY, name TEXT, target_name TEXT, "
+            "total INTEGER, created TEXT, finished INTEGER)"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS result ("
+            "run_id TEXT, setting_key TEXT, target REAL, statistics BLOB, "
+            "PRIMARY KEY (run_id, setting_key))"
+        )
+        self.db.commit()
+
+    def add_run(self, run_id: str, name: str, target_name: str, total: int) -> None:
+        """
+        Register run, existing run is kept as it is for resuming.
+        """
+        self.db.execute(
+            "INSERT OR IGNORE INTO run VALUES (?, ?, ?, ?, ?, 0)",
+            (run_id, name, target_name, total, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        )
+        self.db.commit()
+
+    def finish_run(self, run_id: str) -> None:
+        """"""
+        self.db.execute("UPDATE run SET finished = 1 WHERE run_id = ?", (run_id,))
+        self.db.commit()
+
+    def delete_run(self, run_id: str) -> None:
+        """
+        Delete run together with results of its intermediate rounds.
+        """
+        self.db.execute(
+            "DELETE FROM result WHERE run_id = ? OR run_id LIKE ?", (run_id, f"{run_id}#%")
+        )
+        self.db.execute("DELETE FROM run WHERE run_id = ?", (run_id,))
+        self.db.commit()
+
+    def get_runs(self) -> List[dict]:
+        """
+        Return all stored runs with count of finished settings, newest first.
+        """
+        cursor: sqlite3.Cursor = self.db.execute(
+            "SELECT run.run_id, name, target_name, total, created, finished, "
+            "(SELECT COUNT(*) FROM result WHERE result.run_id = run.run_id) "
+            "FROM run ORDER BY created DESC"
+        )
+
+        keys: list = ["run_id", "name", "target_name", "total", "created", "finished", "count"]
+        return [dict(zip(keys, row)) for row in cursor]
+
+    def get_setting_keys(self, run_id: str) -> Set[str]:
+        """
+        Return keys of settings already stored in the run.
+        """
+        cursor: sqlite3.Cursor = self.db.execute(
+            "SELECT setting_key FROM result WHERE run_id = ?", (run_id,)
+        )
+        return {row[0] for row in cursor}
+
+    def add_results(self, run_id: str, results: List[Tuple]) -> None:
+        """
+        Save results of the run and commit immediately.
+        """
+        if not results:
+            return
+
+        self.db.executemany(
+            "INSERT OR REPLACE INTO result VALUES (?, ?, ?, ?)",
+            [
+                (
+                    run_id,
+                    get_setting_key(setting),
+                    target_value,
+                    pickle.dumps(statistics, pickle.HIGHEST_PROTOCOL)
+                )
+                for setting, target_value, statistics in results
+            ]
+        )
+        self.db.commit()
+
+    def load_results(self, run_id: str) -> List[Tuple]:
+        """
+        Return all stored (setting, target, statistics) tuples of the run.
+        """
+        cursor: sqlite3.Cursor = self.db.execute(
+            "SELECT setting_key, target, statistics FROM result WHERE run_id = ?", (run_id,)
+        )
+        return [
+            (json.loads(setting_key), target_value, pickle.loads(statistics))
+            for setting_key, target_value, statistics in cursor
+        ]
+
+    def close(self) -> None:
+        """"""
+        self.db.close()
+
+
+def init_worker(modules: List[str]) -> None:
+    """
+    Initializer of optimization worker process, import heavy modules once
+    so that evaluations do not pay for it.
+    """
+    for name in modules:
+        try:
+            import_module(name)
+        except Exception:
+            pass
+
+
+def get_chunksize(total: int, max_workers: int) -> int:
+    """
+    Return chunksize giving each worker about 4 chunks, capped for smooth progress.
+    """
+    return max(1, min(64, total // (max_workers * 4)))
+
+
+class OptimizationPool:
+    """
+    Long-lived worker process pool reused across optimization runs.
+    """
+
+    def __init__(self, modules: List[str] = None) -> None:
+        """"""
+        self.modules: List[str] = WORKER_MODULES + (modules or [])
+        self.executor: ProcessPoolExecutor = None
+        self.max_workers: int = 0
+
+    def get_executor(self, max_workers: int = None) -> ProcessPoolExecutor:
+        """
+        Return warm executor, recreated only if worker count changed or broken.
+        """
+        max_workers = max_workers or cpu_count() or 1
+
+        if (
+            self.executor
+            and self.max_workers == max_workers
+            and not getattr(self.executor, "_broken", False)
+        ):
+            return self.executor
+
+        self.shutdown()
+
+        self.executor = ProcessPoolExecutor(
+            max_workers,
+            mp_context=get_context("spawn"),
+            initializer=init_worker,
+            initargs=(self.modules,)
+        )
+        self.max_workers = max_workers
+        return self.executor
+
+    def shutdown(self) -> None:
+        """"""
+        if self.executor:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+            self.max_workers = 0
+
+
+class OptimizationMonitor:
+    """
+    Progress of running optimization, reported periodically with callback,
+    and flag for cancelling the run.
+    """
+
+    def __init__(
+        self,
+        callback: PROGRESS_FUNC = None,
+        top_size: int = 10,
+        interval: float = 1
+    ) -> None:
+        """"""
+        self.callback: PROGRESS_FUNC = callback
+        self.top_size: int = top_size
+        self.interval: float = interval
+
+        self.stop_event: Event = Event()
+        self.start(0, None)
+
+    @property
+    def stopped(self) -> bool:
         """"""
-        keys: dict_keys = self.params.keys()
-        values: dict_values = self.params.values()
-        products: list = list(product(*values))
+        return self.stop_event.is_set()
+
+    def stop(self) -> None:
+        """
+        Request running optimization to stop dispatching new evaluations.
+        """
+        self.stop_event.set()
+
+    def start(self, total: int, key_func: KEY_FUNC, completed: int = 0) -> None:
+        """"""
+        self.total: int = total
+        self.key_func: KEY_FUNC = key_func
+        self.completed: int = completed
+        self.count: int = 0
+
+        self.top: List[Tuple] = []
+        self.start_time: float = perf_counter()
+        self.report_time: float = self.start_time
+
+    def update(self, result: Tuple) -> None:
+        """
+        Record finished evaluation and report if interval has passed.
+        """
+        self.completed += 1
+        self.count += 1
+
+        # Min heap of best results, count breaks tie so that settings are never compared
+        item: tuple = (self.key_func(result), self.count, result[0])
+        if len(self.top) < self.top_size:
+            heappush(self.top, item)
+        elif item[0] > self.top[0][0]:
+            heapreplace(self.top, item)
+
+        if perf_counter() - self.report_time >= self.interval:
+            self.report()
+
+    def report(self, finished: bool = False) -> None:
+        """"""
+        if not self.callback:
+            return
+
+        self.report_time = perf_counter()
+        elapsed: float = self.report_time - self.start_time
+
+        speed: float = self.count / elapsed if elapsed else 0
+        eta: float = max(self.total - self.completed, 0) / speed if speed else 0
 
-        settings: list = []
-        for p in products:
-            setting: dict = dict(zip(keys, p))
-            settings.append(setting)
+        self.callback({
+            "completed": self.completed,
+            "total": self.total,
+            "speed": speed,
+            "eta": eta,
+            "top": [(setting, value) for value, _, setting in sorted(self.top, reverse=True)],
+            "finished": finished,
+            "stopped": self.stopped
+        })
 
-        return settings
+    def finish(self) -> None:
+        """"""
+        self.report(finished=True)
 
 
 def check_optimization_setting(
@@ -87,10 +546,23 @@ def check_optimization_setting(
     output: OUTPUT_FUNC = print
 ) -> bool:
     """"""
-    if not optimization_setting.generate_settings():
+    settings: SettingSpace = optimization_setting.generate_settings()
+    if not settings:
         output("优化参数组合为空，请检查")
         return False
 
+    for name, constraint in optimization_setting.constraints:
+        try:
+            constraint(settings[0])
+        except Exception as e:
+            output(f"参数约束{name}执行出错：{e!r}")
+            return False
+
+    # Only look for the first valid setting, full count is left to optimization
+    if next(settings.iter_valid(), None) is None:
+        output("满足参数约束的优化参数组合为空，请检查")
+        return False
+
     if not optimization_setting.target_name:
         output("优化目标未设置，请检查")
         return False
@@ -103,30 +575,78 @@ def run_bf_optimization(
     optimization_setting: OptimizationSetting,
     key_func: KEY_FUNC,
     max_workers: int = None,
-    output: OUTPUT_FUNC = print
+    output: OUTPUT_FUNC = print,
+    executor: ProcessPoolExecutor = None,
+    store: ResultStore = None,
+    run_id: str = "",
+    monitor: OptimizationMonitor = None
 ) -> List[Tuple]:
-    """Run brutal force optimization"""
-    settings: List[Dict] = optimization_setting.generate_settings()
+    """Run brutal force optimization, with given executor reused if provided"""
+    settings: SettingSpace = optimization_setting.generate_settings()
 
     output("开始执行穷举算法优化")
-    output(f"参数优化空间：{len(settings)}")
+    output(settings.get_info())
+
+    # Skip settings already finished in stored run
+    finished: Set[str] = set()
+    if store:
+        finished = store.get_setting_keys(run_id)
+        if finished:
+            output(f"从结果库恢复已完成参数：{len(finished)}")
+
+    pending: Iterator[dict] = (
+        s for s in settings.iter_valid() if get_setting_key(s) not in finished
+    )
 
     start: int = perf_counter()
 
-    with ProcessPoolExecutor(
-        max_workers,
-        mp_context=get_context("spawn")
-    ) as executor:
-        it: Iterable = tqdm(
-            executor.map(evaluate_func, settings),
-            total=len(settings)
-        )
-        results: List[Tuple] = list(it)
+    monitor = monitor or OptimizationMonitor()
+    monitor.start(settings.count_valid(), key_func, len(finished))
+
+    # Dispatch settings chunk by chunk so that the whole space is never materialized
+    workers: int = max_workers or cpu_count() or 1
+
+    with ExitStack() as stack:
+        if not executor:
+            executor = stack.enter_context(ProcessPoolExecutor(
+                max_workers,
+                mp_context=get_context("spawn")
+            ))
+
+        results: List[Tuple] = []
+        buf: List[Tuple] = []
+        last_save: float = perf_counter()
+
+        with tqdm(total=settings.count_valid(), initial=len(finished)) as progress:
+            for result in iter_results(executor, evaluate_func, pending, workers, monitor):
+                progress.update(1)
+
+                if not store:
+                    results.append(result)
+                    continue
+
+                # Commit to store at least every second
+                buf.append(result)
+                if perf_counter() - last_save >= 1:
+                    store.add_results(run_id, buf)
+                    buf = []
+                    last_save = perf_counter()
+
+        if store:
+            store.add_results(run_id, buf)
+            if not monitor.stopped:
+                store.finish_run(run_id)
+            results = store.load_results(run_id)
+
         results.sort(reverse=True, key=key_func)
+        monitor.finish()
 
         end: int = perf_counter()
         cost: int = int((end - start))
-        output(f"穷举算法优化完成，耗时{cost}秒")
+        if monitor.stopped:
+            output(f"穷举算法优化已停止，耗时{cost}秒")
+        else:
+            output(f"穷举算法优化完成，耗时{cost}秒")
 
         return results
 
@@ -138,16 +658,28 @@ def run_ga_optimization(
     max_workers: int = None,
     population_size: int = 100,
     ngen_size: int = 30,
-    output: OUTPUT_FUNC = print
+    output: OUTPUT_FUNC = print,
+    executor: ProcessPoolExecutor = None,
+    store: ResultStore = None,
+    run_id: str = "",
+    monitor: OptimizationMonitor = None
 ) -> List[Tuple]:
-    """Run genetic algorithm optimization"""
+    """Run genetic algorithm optimization, with given executor reused if provided"""
     # Define functions for generate parameter randomly
-    buf: List[Dict] = optimization_setting.generate_settings()
-    settings: List[Tuple] = [list(d.items()) for d in buf]
+    settings: SettingSpace = optimization_setting.generate_settings()
 
     def generate_parameter() -> list:
-        """"""
-        return choice(settings)
+        """
+        Return random setting satisfying constraints.
+        """
+        for _ in range(1000):
+            setting: dict = settings[randrange(len(settings))]
+            if settings.check(setting):
+                return list(setting.items())
+
+        # Pick from valid ones directly when rejection sampling keeps failing
+        ix: int = randrange(settings.count_valid())
+        return list(next(islice(settings.iter_valid(), ix, None)).items())
 
     def mutate_individual(individual: list, indpb: float) -> tuple:
         """"""
@@ -156,31 +688,93 @@ def run_ga_optimization(
         for i in range(size):
             if random() < indpb:
                 individual[i] = paramlist[i]
+
+        # Replace invalid mutant with the valid random setting
+        if not settings.check(dict(individual)):
+            individual[:] = paramlist
         return individual,
 
-    # Set up multiprocessing Pool and Manager
-    ctx: BaseContext = get_context("spawn")
-    with ctx.Manager() as manager, ctx.Pool(max_workers) as pool:
-        # Create shared dict for result cache
-        cache: Dict[Tuple, Tuple] = manager.dict()
+    def mate_individuals(ind1: list, ind2: list) -> tuple:
+        """
+        Two point crossover, child violating constraints keeps parent genes.
+        """
+        parents: Tuple[list, list] = (ind1[:], ind2[:])
+        tools.cxTwoPoint(ind1, ind2)
+
+        for child, parent in zip((ind1, ind2), parents):
+            if not settings.check(dict(child)):
+                child[:] = parent
+        return ind1, ind2
+
+    # Results are cached in parent process, filled with results of stored run
+    cache: Dict[Tuple, Tuple] = {}
+    if store:
+        for result in store.load_results(run_id):
+            cache[tuple((k, result[0][k]) for k in settings.keys)] = result
+
+        if cache:
+            output(f"从结果库恢复已完成参数：{len(cache)}")
+
+    def get_fitness(individual: list) -> tuple:
+        """
+        Return fitness from cache, individual skipped after stop gets the worst.
+        """
+        result: Tuple = cache.get(tuple(individual), None)
+        if not result:
+            return PRUNED_VALUE,
+        return key_func(result),
+
+    monitor = monitor or OptimizationMonitor()
+    monitor.start(
+        min(settings.count_valid(), population_size * (ngen_size + 1)),
+        key_func,
+        len(cache)
+    )
+
+    with ExitStack() as stack:
+        if not executor:
+            executor = stack.enter_context(ProcessPoolExecutor(
+                max_workers,
+                mp_context=get_context("spawn")
+            ))
+
+        workers: int = max_workers or cpu_count() or 1
+
+        def map_individuals(func: Callable, individuals: list) -> list:
+            """
+            Evaluate unseen and deduplicated individuals of one generation in
+            batch, then look up fitness of all from cache.
+            """
+            unseen: list = list(dict.fromkeys(
+                tp for tp in map(tuple, individuals) if tp not in cache
+            ))
+
+            if unseen and not monitor.stopped:
+                results: list = list(iter_results(
+                    executor,
+                    evaluate_func,
+                    [dict(tp) for tp in unseen],
+                    workers,
+                    monitor,
+                    len(unseen)
+                ))
+                cache.update(zip(unseen, results))
+
+                if store:
+                    store.add_results(run_id, results)
+
+            return [func(individual) for individual in individuals]
 
         # Set up toolbox
         toolbox: base.Toolbox = base.Toolbox()
         toolbox.register("individual", tools.initIterate, creator.Individual, generate_parameter)
         toolbox.register("population", tools.initRepeat, list, toolbox.individual)
-        toolbox.register("mate", tools.cxTwoPoint)
+        toolbox.register("mate", mate_individuals)
         toolbox.register("mutate", mutate_individual, indpb=1)
         toolbox.register("select", tools.selNSGA2)
-        toolbox.register("map", pool.map)
-        toolbox.register(
-            "evaluate",
-            ga_evaluate,
-            cache,
-            evaluate_func,
-            key_func
-        )
+        toolbox.register("map", map_individuals)
+        toolbox.register("evaluate", get_fitness)
 
-        total_size: int = len(settings)
         pop_size: int = population_size                      # number of individuals in each generation
         lambda_: int = pop_size                              # number of children to produce at each generation
         mu: int = int(pop_size * 0.8)                        # number of individuals to select for the next generation
@@ -193,7 +787,7 @@ def run_ga_optimization(
 
         # Run ga optimization
         output("开始执行遗传算法优化")
-        output(f"参数优化空间：{total_size}")
+        output(settings.get_info())
         output(f"每代族群总数：{pop_size}")
         output(f"优良筛选个数：{mu}")
         output(f"迭代次数：{ngen}")
@@ -216,29 +810,390 @@ def run_ga_optimization(
         end: int = perf_counter()
         cost: int = int((end - start))
 
-        output(f"遗传算法优化完成，耗时{cost}秒")
+        if monitor.stopped:
+            output(f"遗传算法优化已停止，耗时{cost}秒")
+        else:
+            output(f"遗传算法优化完成，耗时{cost}秒")
+
+            if store:
+                store.finish_run(run_id)
 
         results: list = list(cache.values())
         results.sort(reverse=True, key=key_func)
+        monitor.finish()
         return results
 
 
-def ga_evaluate(
-    cache: dict,
-    evaluate_func: callable,
-    key_func: callable,
-    parameters: list
-) -> float:
+def run_bayes_optimization(
+    evaluate_func: EVALUATE_FUNC,
+    optimization_setting: OptimizationSetting,
+    key_func: KEY_FUNC,
+    max_workers: int = None,
+    max_evals: int = None,
+    gamma: float = 0.25,
+    candidate_size: int = 256,
+    output: OUTPUT_FUNC = print,
+    executor: ProcessPoolExecutor = None,
+    store: ResultStore = None,
+    run_id: str = "",
+    monitor: OptimizationMonitor = None
+) -> List[Tuple]:
     """
-    Functions to be run in genetic algorithm optimization.
+    Run bayesian optimization with tree-structured parzen estimator (TPE),
+    with given executor reused if provided.
+
+    Each parameter is modelled on its grid positions. Evaluated settings are
+    split into good and bad groups by target value, candidates are sampled
+    from the good density and the ones with highest good/bad density ratio
+    are evaluated in batches of worker count.
     """
-    tp: tuple = tuple(parameters)
-    if tp in cache:
-        result: tuple = cache[tp]
+    settings: SettingSpace = optimization_setting.generate_settings()
+    total_size: int = len(settings)
+    valid_size: int = settings.count_valid()
+
+    workers: int = max_workers or cpu_count() or 1
+    batch_size: int = workers
+
+    if not max_evals:
+        max_evals = max(50, valid_size // 10)
+    max_evals = min(max_evals, valid_size)
+    init_size: int = min(max_evals, max(10, batch_size))
+
+    sizes: np.ndarray = np.array([len(v) for v in settings.values], dtype=np.int64)
+    strides: np.ndarray = np.ones(len(sizes), dtype=np.int64)
+    for i in range(len(sizes) - 2, -1, -1):
+        strides[i] = strides[i + 1] * sizes[i + 1]
+
+    rng: np.random.Generator = np.random.default_rng()
+
+    # Evaluated results keyed by setting index
+    observed: Dict[int, Tuple] = {}
+    if store:
+        for result in store.load_results(run_id):
+            try:
+                observed[settings.index(result[0])] = result
+            except (KeyError, ValueError):
+                continue
+
+    # Indexes of settings violating constraints
+    rejected: Set[int] = set()
+
+    def accept(ix: int, excluded: Set[int]) -> bool:
+        """
+        Exclude index from later sampling, return whether it is new and valid.
+        """
+        if ix in excluded or ix in rejected:
+            return False
+
+        if not settings.check(settings[ix]):
+            rejected.add(ix)
+            return False
+
+        excluded.add(ix)
+        return True
+
+    def sample_random(n: int, excluded: Set[int]) -> List[int]:
+        """
+        Sample setting indexes uniformly from those not excluded.
+        """
+        indexes: List[int] = []
+        for _ in range(n * 100):
+            if len(indexes) == n:
+                return indexes
+
+            ix: int = int(rng.integers(total_size))
+            if accept(ix, excluded):
+                indexes.append(ix)
+
+        # Fall back to scanning when space is almost exhausted
+        for ix in range(total_size):
+            if len(indexes) == n:
+                break
+            if accept(ix, excluded):
+                indexes.append(ix)
+        return indexes
+
+    def estimate_density(positions: np.ndarray, size: int) -> np.ndarray:
+        """
+        Parzen estimate of grid position density mixed with uniform prior.
+        """
+        grid: np.ndarray = np.arange(size)
+        bandwidth: float = max(1.0, size / (len(positions) ** 0.5 + 1))
+
+        kernels: np.ndarray = np.exp(-0.5 * ((grid[None, :] - positions[:, None]) / bandwidth) ** 2)
+        kernels /= kernels.sum(axis=1, keepdims=True)
+
+        density: np.ndarray = (kernels.sum(axis=0) + 1 / size) / (len(positions) + 1)
+        return density / density.sum()
+
+    def propose(n: int) -> List[int]:
+        """
+        Propose indexes of next batch with TPE.
+        """
+        excluded: Set[int] = set(observed)
+        if len(observed) < init_size:
+            return sample_random(n, excluded)
+
+        indexes: np.ndarray = np.fromiter(observed.keys(), dtype=np.int64)
+        values: np.ndarray = np.array([key_func(r) for r in observed.values()], dtype=float)
+        values[~np.isfinite(values)] = -np.inf
+
+        coords: np.ndarray = (indexes[:, None] // strides) % sizes
+        order: np.ndarray = np.argsort(-values, kind="stable")
+        good_size: int = max(1, int(np.ceil(gamma * len(order))))
+        good: np.ndarray = coords[order[:good_size]]
+        bad: np.ndarray = coords[order[good_size:]]
+
+        candidates: np.ndarray = np.empty((candidate_size * n, len(sizes)), dtype=np.int64)
+        scores: np.ndarray = np.zeros(len(candidates))
+
+        for d, size in enumerate(sizes):
+            l_density: np.ndarray = estimate_density(good[:, d], size)
+            g_density: np.ndarray = estimate_density(bad[:, d], size)
+
+            candidates[:, d] = rng.choice(size, len(candidates), p=l_density)
+            scores += np.log(l_density[candidates[:, d]]) - np.log(g_density[candidates[:, d]])
+
+        proposals: List[int] = []
+        for i in np.argsort(-scores, kind="stable"):
+            ix: int = int(candidates[i] @ strides)
+            if accept(ix, excluded):
+                proposals.append(ix)
+                if len(proposals) == n:
+                    return proposals
+
+        # Fill up with random ones if candidates are all evaluated
+        return proposals + sample_random(n - len(proposals), excluded)
+
+    output("开始执行贝叶斯优化")
+    output(settings.get_info())
+    output(f"最大评估次数：{max_evals}")
+    output(f"每批评估数量：{batch_size}")
+    output(f"随机初始数量：{init_size}")
+    if observed:
+        output(f"从结果库恢复已完成参数：{len(observed)}")
+
+    start: int = perf_counter()
+
+    monitor = monitor or OptimizationMonitor()
+    monitor.start(max_evals, key_func, len(observed))
+
+    with ExitStack() as stack:
+        if not executor:
+            executor = stack.enter_context(ProcessPoolExecutor(
+                max_workers,
+                mp_context=get_context("spawn")
+            ))
+
+        with tqdm(total=max_evals, initial=min(len(observed), max_evals)) as progress:
+            while len(observed) < max_evals and not monitor.stopped:
+                indexes: List[int] = propose(min(batch_size, max_evals - len(observed)))
+                batch: List[dict] = [settings[ix] for ix in indexes]
+
+                results: List[Tuple] = list(iter_results(
+                    executor, evaluate_func, batch, workers, monitor, len(batch)
+                ))
+                observed.update(zip(indexes, results))
+                progress.update(len(results))
+
+                if store:
+                    store.add_results(run_id, results)
+
+    end: int = perf_counter()
+    cost: int = int((end - start))
+
+    if monitor.stopped:
+        output(f"贝叶斯优化已停止，耗时{cost}秒")
     else:
-        setting: dict = dict(parameters)
-        result: dict = evaluate_func(setting)
-        cache[tp] = result
+        output(f"贝叶斯优化完成，耗时{cost}秒")
+
+        if store:
+            store.finish_run(run_id)
+
+    results: list = list(observed.values())
+    results.sort(reverse=True, key=key_func)
+    monitor.finish()
+    return results
+
+
+def run_halving_optimization(
+    evaluate_funcs: List[EVALUATE_FUNC],
+    optimization_setting: OptimizationSetting,
+    key_func: KEY_FUNC,
+    max_workers: int = None,
+    eta: float = 3,
+    output: OUTPUT_FUNC = print,
+    executor: ProcessPoolExecutor = None,
+    store: ResultStore = None,
+    run_id: str = "",
+    monitor: OptimizationMonitor = None
+) -> List[Tuple]:
+    """
+    Run successive halving optimization, with given executor reused if provided.
+
+    Evaluate functions are ordered from lowest to full fidelity. All settings
+    are evaluated with the first one, only the top 1/eta of them survive into
+    the next round, and results of the last round are returned.
+
+    With store provided, results of each round are saved as they finish
+    (intermediate rounds under run_id suffixed with round number), so that
+    an interrupted run is resumed from the round it stopped in.
+    """
+    settings: SettingSpace = optimization_setting.generate_settings()
+
+    output("开始执行逐级淘汰优化")
+    output(settings.get_info())
+    output(f"评估轮数：{len(evaluate_funcs)}")
+    output(f"淘汰比例：{1 - 1 / eta:.0%}")
+
+    start: int = perf_counter()
+
+    # Total evaluations of all rounds
+    total: int = 0
+    size: int = settings.count_valid()
+    for _ in evaluate_funcs:
+        total += size
+        size = max(1, ceil(size / eta))
+
+    monitor = monitor or OptimizationMonitor()
+    monitor.start(total, key_func)
+
+    workers: int = max_workers or cpu_count() or 1
+
+    with ExitStack() as stack:
+        if not executor:
+            executor = stack.enter_context(ProcessPoolExecutor(
+                max_workers,
+                mp_context=get_context("spawn")
+            ))
+
+        def evaluate_all(
+            func: EVALUATE_FUNC,
+            candidates: Iterable[dict],
+            size: int,
+            round_id: str
+        ) -> Iterator[Tuple]:
+            """
+            Yield results of the round, including those restored from store.
+            """
+            finished: Set[str] = set()
+            if store:
+                finished = store.get_setting_keys(round_id)
+                if finished:
+                    output(f"从结果库恢复已完成参数：{len(finished)}")
+                    monitor.completed += len(finished)
+                    yield from store.load_results(round_id)
+
+            pending: Iterator[dict] = (
+                s for s in candidates if get_setting_key(s) not in finished
+            )
+
+            buf: List[Tuple] = []
+            last_save: float = perf_counter()
+
+            with tqdm(total=size, initial=len(finished)) as progress:
+                for result in iter_results(executor, func, pending, workers, monitor):
+                    progress.update(1)
+                    yield result
+
+                    if not store:
+                        continue
+
+                    # Commit to store at least every second
+                    buf.append(result)
+                    if perf_counter() - last_save >= 1:
+                        store.add_results(round_id, buf)
+                        buf = []
+                        last_save = perf_counter()
+
+            if store:
+                store.add_results(round_id, buf)
+
+        # Results of last finished round are returned if stopped
+        results: List[Tuple] = []
+        candidates: Iterable[dict] = settings.iter_valid()
+        size: int = settings.count_valid()
+
+        for i, func in enumerate(evaluate_funcs):
+            if monitor.stopped:
+                break
+
+            output(f"第{i + 1}轮评估参数数量：{size}")
+
+            if i == len(evaluate_funcs) - 1:
+                round_results: List[Tuple] = list(evaluate_all(func, candidates, size, run_id))
+                if not monitor.stopped:
+                    results = round_results
+                break
+
+            # Only keep best results so that memory does not grow with space
+            keep: int = max(1, ceil(size / eta))
+            round_results: List[Tuple] = nlargest(
+                keep,
+                evaluate_all(func, candidates, size, f"{run_id}#{i + 1}"),
+                key=key_func
+            )
+            if monitor.stopped:
+                break
+
+            results = round_results
+            candidates = [result[0] for result in results]
+            size = len(candidates)
+
+    results.sort(reverse=True, key=key_func)
+    monitor.finish()
+
+    end: int = perf_counter()
+    cost: int = int((end - start))
+
+    if monitor.stopped:
+        output(f"逐级淘汰优化已停止，耗时{cost}秒")
+        return results
+
+    if store:
+        store.finish_run(run_id)
+
+    output(f"逐级淘汰优化完成，耗时{cost}秒")
+    return results
+
+
+def iter_chunks(iterable: Iterable, size: int) -> Iterator[list]:
+    """
+    Split iterable into lists with given size.
+    """
+    it: Iterator = iter(iterable)
+    while True:
+        chunk: list = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_results(
+    executor: ProcessPoolExecutor,
+    func: EVALUATE_FUNC,
+    items: Iterable,
+    workers: int,
+    monitor: OptimizationMonitor,
+    chunk_size: int = None
+) -> Iterator[Tuple]:
+    """
+    Evaluate items chunk by chunk with executor and record them in monitor,
+    pending evaluations are cancelled once monitor is stopped.
+    """
+    chunk_size = chunk_size or workers * 256
+
+    for chunk in iter_chunks(items, chunk_size):
+        if monitor.stopped:
+            return
+
+        it: Iterator = executor.map(func, chunk, chunksize=get_chunksize(len(chunk), workers))
+        try:
+            for result in it:
+                monitor.update(result)
+                yield result
 
-    value: float = key_func(result)
-    return (value, )
+                if monitor.stopped:
+                    return
+        finally:
+            it.close()
@@ -1,6 +1,9 @@
 """
 源自vnpy
 """
+import numpy as np
+import talib
+
 from strategies.template import (
     CtaTemplate,
     StopOrder,
@@ -10,6 +13,7 @@ from strategies.template import (
     OrderData,
 )
 
+from trader.history import BarHistory
 from trader.utility import BarGenerator, ArrayManager
 
 
@@ -117,3 +121,83 @@ class DoubleMaStrategy(CtaTemplate):
         Callback of stop order update.
         """
         pass
+
+    def calculate_target_pos(self, history: BarHistory) -> np.ndarray:
+        """
+        Calculate target position of every bar for vectorized backtesting.
+        """
+        close: np.ndarray = history.close_price
+
+        fast_ma: np.ndarray = talib.SMA(close, self.fast_window)
+        slow_ma: np.ndarray = talib.SMA(close, self.slow_window)
+
+        fast_ma1: np.ndarray = np.roll(fast_ma, 1)
+        slow_ma1: np.ndarray = np.roll(slow_ma, 1)
+
+        cross_over: np.ndarray = (fast_ma > slow_ma) & (fast_ma1 < slow_ma1)
+        cross_below: np.ndarray = (fast_ma < slow_ma) & (fast_ma1 > slow_ma1)
+
+        signal: np.ndarray = np.full(len(close), np.nan)
+        signal[cross_over] = 1
+        signal[cross_below] = -1
+
+        # No signal before array manager inited
+        signal[:self.am.size - 1] = np.nan
+        signal[0] = 0
+
+        # Hold last signal position until next signal
+        ix: np.ndarray = np.where(np.isnan(signal), 0, np.arange(len(signal)))
+        np.maximum.accumulate(ix, out=ix)
+        return signal[ix]
+
+    @classmethod
+    def calculate_target_pos_batch(cls, history: BarHistory, settings: list) -> np.ndarray:
+        """
+        Calculate target position of every bar for a batch of settings,
+        moving average of each window is calculated only once.
+        """
+        close: np.ndarray = history.close_price
+
+        fast_windows: list = [s.get("fast_window", cls.fast_window) for s in settings]
+        slow_windows: list = [s.get("slow_window", cls.slow_window) for s in settings]
+
+        windows: list = sorted(set(fast_windows + slow_windows))
+        window_ix: dict = {w: i for i, w in enumerate(windows)}
+        ma: np.ndarray = np.stack([talib.SMA(close, w) for w in windows])
+
+        # Sign of fast_ma - slow_ma is the same as comparing them directly
+        diff: np.ndarray = (
+            ma[[window_ix[w] for w in fast_windows]]
+            - ma[[window_ix[w] for w in slow_windows]]
+        )
+        above: np.ndarray = diff > 0
+        below: np.ndarray = diff < 0
+
+        cross_over: np.ndarray = np.zeros(diff.shape, dtype=bool)
+        cross_over[:, 1:] = above[:, 1:] & below[:, :-1]
+
+        cross_below: np.ndarray = np.zeros(diff.shape, dtype=bool)
+        cross_below[:, 1:] = below[:, 1:] & above[:, :-1]
+
+        # No signal before array manager inited
+        init_size: int = ArrayManager().size - 1
+        cross_over[:, :init_size] = False
+        cross_below[:, :init_size] = False
+
+        # Signals are sparse, so position changes are only put on signal bars
+        ix: np.ndarray = np.flatnonzero(cross_over | cross_below)
+        rows: np.ndarray = ix // diff.shape[1]
+        signal: np.ndarray = np.where(cross_over.ravel()[ix], 1.0, -1.0)
+
+        first: np.ndarray = np.ones(len(ix), dtype=bool)
+        first[1:] = rows[1:] != rows[:-1]
+
+        pos_change: np.ndarray = signal.copy()
+        pos_change[1:] -= signal[:-1]
+        pos_change[first] = signal[first]
+
+        # Hold last signal position until next signal
+        target_pos: np.ndarray = np.zeros(diff.shape)
+        target_pos.ravel()[ix] = pos_change
+        np.cumsum(target_pos, axis=1, out=target_pos)
+        return target_pos
@@ -3,10 +3,13 @@
 """
 from abc import ABC
 from copy import copy
-from typing import Any, Callable, List
+from typing import Any, Callable, List, Optional
+
+import numpy as np
 
 from trader.constant import Interval, Direction, Offset, EngineType
 from trader.object import BarData, TickData, OrderData, TradeData, StopOrder
+from trader.history import BarHistory
 from trader.utility import virtual
 
 
@@ -148,6 +151,27 @@ class CtaTemplate(ABC):
         """
         pass
 
+    @virtual
+    def calculate_target_pos(self, history: BarHistory) -> Optional[np.ndarray]:
+        """
+        Calculate target position of every bar for vectorized backtesting.
+        Return None if not supported by the strategy.
+        """
+        return None
+
+    @classmethod
+    def calculate_target_pos_batch(
+        cls,
+        history: BarHistory,
+        settings: List[dict]
+    ) -> Optional[np.ndarray]:
+        """
+        Calculate target position of every bar for a batch of settings, as
+        2D array of shape (len(settings), len(history)). Return None if not
+        supported, then calculate_target_pos is called for every setting.
+        """
+        return None
+
     def buy(
         self,
         price: float,
@@ -0,0 +1,518 @@
+"""
+按字段列式存储的历史数据容器，用于回测时降低内存占用
+"""
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone, tzinfo
+from hashlib import sha1
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .constant import Exchange, Interval
+from .object import BarData, TickData
+
+
+EPOCH: datetime = datetime(1970, 1, 1)
+EPOCH_UTC: datetime = EPOCH.replace(tzinfo=timezone.utc)
+EPOCH_ORDINAL: int = EPOCH.toordinal()
+
+# Number of rows converted into data objects at a time during iteration
+ITER_CHUNK_SIZE: int = 10_000
+
+
+def to_timestamp(dt: datetime) -> int:
+    """
+    Convert datetime into int64 nanosecond timestamp.
+
+    Naive datetime is treated as wall clock time in UTC.
+    """
+    if dt.tzinfo:
+        delta: timedelta = dt - EPOCH_UTC
+    else:
+        delta: timedelta = dt - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000_000 + delta.microseconds * 1000
+
+
+def localize_timestamps(timestamps: np.ndarray, tz: Optional[tzinfo]) -> np.ndarray:
+    """
+    Convert int64 nanosecond timestamps of wall clock time in tz into UTC.
+    """
+    if not tz or not len(timestamps):
+        return timestamps
+
+    # Timezone offset only changes at whole hours, so look it up once per run of same hour
+    hours: np.ndarray = timestamps // 3_600_000_000_000
+    starts: np.ndarray = np.flatnonzero(np.diff(hours, prepend=hours[0] - 1))
+    lengths: np.ndarray = np.diff(starts, append=len(hours))
+
+    unique_hours, inverse = np.unique(hours[starts], return_inverse=True)
+    offsets: np.ndarray = np.array([
+        (EPOCH + timedelta(hours=h)).replace(tzinfo=tz).utcoffset() // timedelta(seconds=1)
+        for h in unique_hours.tolist()
+    ], dtype=np.int64)
+
+    return timestamps - np.repeat(offsets[inverse], lengths) * 1_000_000_000
+
+
+def to_local_timestamps(timestamps: np.ndarray, tz: Optional[tzinfo]) -> np.ndarray:
+    """
+    Convert int64 nanosecond UTC timestamps into wall clock time in tz.
+    """
+    if not tz or not len(timestamps):
+        return timestamps
+
+    # Timezone offset only changes at whole hours, so look it up once per run of same hour
+    hours: np.ndarray = timestamps // 3_600_000_000_000
+    starts: np.ndarray = np.flatnonzero(np.diff(hours, prepend=hours[0] - 1))
+    lengths: np.ndarray = np.diff(starts, append=len(hours))
+
+    unique_hours, inverse = np.unique(hours[starts], return_inverse=True)
+    offsets: np.ndarray = np.array([
+        datetime.fromtimestamp(h * 3600, tz).utcoffset() // timedelta(seconds=1)
+        for h in unique_hours.tolist()
+    ], dtype=np.int64)
+
+    return timestamps + np.repeat(offsets[inverse], lengths) * 1_000_000_000
+
+
+def from_timestamps(timestamps: np.ndarray, tz: Optional[tzinfo]) -> List[datetime]:
+    """
+    Convert int64 nanosecond timestamps back into datetime objects.
+    """
+    seconds, nanos = np.divmod(timestamps, 1_000_000_000)
+    micros: np.ndarray = nanos // 1000
+
+    if tz:
+        return [
+            datetime.fromtimestamp(s, tz).replace(microsecond=us)
+            for s, us in zip(seconds.tolist(), micros.tolist())
+        ]
+    else:
+        return [
+            EPOCH + timedelta(seconds=s, microseconds=us)
+            for s, us in zip(seconds.tolist(), micros.tolist())
+        ]
+
+
+class BaseHistory(ABC):
+    """
+    Columnar container of history data.
+
+    Every field is kept in one contiguous numpy array, datetime is kept as
+    int64 nanosecond timestamps. Data objects are only created when accessed.
+    """
+
+    fields: tuple = ()
+
+    def __init__(
+        self,
+        symbol: str,
+        exchange: Exchange,
+        tz: tzinfo = None,
+        gateway_name: str = "DB",
+        columns: Dict[str, np.ndarray] = None
+    ) -> None:
+        """"""
+        self.symbol: str = symbol
+        self.exchange: Exchange = exchange
+        self.tz: tzinfo = tz
+        self.gateway_name: str = gateway_name
+
+        if columns is None:
+            columns = {}
+
+        self.datetime: np.ndarray = columns.get("datetime", np.zeros(0, dtype=np.int64))
+        for name in self.fields:
+            setattr(self, name, columns.get(name, np.zeros(len(self.datetime))))
+
+    def __len__(self) -> int:
+        """"""
+        return len(self.datetime)
+
+    def __getitem__(self, key: Union[int, slice]) -> Union["BaseHistory", BarData, TickData]:
+        """
+        Return a data object for int index, or a view of history for slice.
+        """
+        if isinstance(key, slice):
+            return self.new(self.get_columns(key))
+
+        dt: datetime = from_timestamps(self.datetime[key: key + 1 or None], self.tz)[0]
+        values: list = [getattr(self, name)[key].item() for name in self.fields]
+        return self.create_data(dt, values)
+
+    def __iter__(self) -> Iterator[Union[BarData, TickData]]:
+        """
+        Iterate data objects chunk by chunk.
+        """
+        for i in range(0, len(self), ITER_CHUNK_SIZE):
+            j: int = i + ITER_CHUNK_SIZE
+
+            dts: List[datetime] = from_timestamps(self.datetime[i:j], self.tz)
+            rows: zip = zip(*[getattr(self, name)[i:j].tolist() for name in self.fields])
+
+            for dt, values in zip(dts, rows):
+                yield self.create_data(dt, values)
+
+    def get_columns(self, key: Union[slice, np.ndarray] = slice(None)) -> Dict[str, np.ndarray]:
+        """
+        Return dict of column arrays selected by key.
+        """
+        columns: Dict[str, np.ndarray] = {"datetime": self.datetime[key]}
+        for name in self.fields:
+            columns[name] = getattr(self, name)[key]
+        return columns
+
+    def get_datetime(self, ix: int) -> datetime:
+        """
+        Return datetime of row at ix.
+        """
+        return from_timestamps(self.datetime[ix: ix + 1 or None], self.tz)[0]
+
+    def truncate(self, end: datetime) -> "BaseHistory":
+        """
+        Return view of history with rows not later than end.
+        """
+        if not end.tzinfo and self.tz:
+            end = end.replace(tzinfo=self.tz)
+
+        ix: int = int(np.searchsorted(self.datetime, to_timestamp(end), side="right"))
+        if ix == len(self):
+            return self
+        return self[:ix]
+
+    def get_days(self) -> np.ndarray:
+        """
+        Return local trading day of every row as days since 1970-01-01.
+        """
+        return to_local_timestamps(self.datetime, self.tz) // 86_400_000_000_000
+
+    def get_fingerprint(self) -> str:
+        """
+        Return hash of meta data and all column values.
+        """
+        hasher = sha1()
+        hasher.update(f"{type(self).__name__}|{self.symbol}|{self.exchange}|{len(self)}".encode())
+
+        for name in ("datetime",) + self.fields:
+            hasher.update(np.ascontiguousarray(getattr(self, name)).data)
+
+        return hasher.hexdigest()
+
+    def share(self) -> Tuple[SharedMemory, "HistoryHandle"]:
+        """
+        Copy all columns into one shared memory block.
+
+        Return the shared memory, which should be closed and unlinked by
+        caller after use, and a picklable handle for attaching to it.
+        """
+        names: tuple = ("datetime",) + self.fields
+        arrays: List[np.ndarray] = [getattr(self, name) for name in names]
+
+        shm: SharedMemory = SharedMemory(create=True, size=max(sum(a.nbytes for a in arrays), 1))
+
+        layout: list = []
+        offset: int = 0
+        for name, array in zip(names, arrays):
+            view: np.ndarray = np.ndarray(array.shape, array.dtype, shm.buf, offset)
+            view[:] = array
+            layout.append((name, array.dtype.str, offset, len(array)))
+            offset += array.nbytes
+
+        handle: HistoryHandle = HistoryHandle(
+            shm_name=shm.name,
+            template=self.new({}),
+            layout=layout,
+            fingerprint=self.get_fingerprint()
+        )
+        return shm, handle
+
+    @abstractmethod
+    def new(self, columns: Dict[str, np.ndarray]) -> "BaseHistory":
+        """
+        Create a new history with same meta data and given columns.
+        """
+        pass
+
+    @abstractmethod
+    def create_data(self, dt: datetime, values: Sequence) -> Union[BarData, TickData]:
+        """
+        Create data object with datetime and field values.
+        """
+        pass
+
+    @classmethod
+    def concatenate(cls, histories: List["BaseHistory"]) -> "BaseHistory":
+        """
+        Concatenate a list of history into a new one.
+        """
+        # Take meta data from the first non-empty history
+        first: BaseHistory = next((h for h in histories if len(h)), histories[0])
+
+        columns: Dict[str, np.ndarray] = {}
+        for name in ("datetime",) + first.fields:
+            columns[name] = np.concatenate([getattr(h, name) for h in histories])
+
+        return first.new(columns)
+
+
+@dataclass
+class HistoryHandle:
+    """
+    Picklable reference to history data kept in shared memory.
+    """
+
+    shm_name: str
+    template: BaseHistory
+    layout: List[Tuple[str, str, int, int]]
+    fingerprint: str = ""
+
+
+# Shared memory attached in current process, kept open for zero-copy access
+attached_histories: Dict[str, Tuple[SharedMemory, BaseHistory]] = {}
+
+
+def release_histories(keep: str = "") -> None:
+    """
+    Close shared memory attached in current process except the one named keep.
+    """
+    for shm_name in list(attached_histories):
+        if shm_name == keep:
+            continue
+
+        shm, _ = attached_histories.pop(shm_name)
+        try:
+            shm.close()
+        except BufferError:
+            # Arrays still viewing the buffer keep mapping alive until collected
+            pass
+
+
+def attach_history(handle: HistoryHandle) -> BaseHistory:
+    """
+    Attach to history data in shared memory, cached per process.
+
+    Only history of the latest handle is kept, since warm worker processes
+    outlive optimization runs and each run shares a new block.
+    """
+    if handle.shm_name in attached_histories:
+        return attached_histories[handle.shm_name][1]
+
+    release_histories()
+
+    # Worker processes share resource tracker of creator process, which
+    # unlinks shared memory only after creator exits
+    shm: SharedMemory = SharedMemory(name=handle.shm_name)
+
+    columns: Dict[str, np.ndarray] = {}
+    for name, dtype, offset, size in handle.layout:
+        columns[name] = np.ndarray(size, np.dtype(dtype), shm.buf, offset)
+
+    history: BaseHistory = handle.template.new(columns)
+    attached_histories[handle.shm_name] = (shm, history)
+    return history
+
+
+class BarHistory(BaseHistory):
+    """
+    Columnar container of bar data.
+    """
+
+    fields: tuple = (
+        "volume",
+        "turnover",
+        "open_interest",
+        "open_price",
+        "high_price",
+        "low_price",
+        "close_price",
+    )
+
+    def __init__(
+        self,
+        symbol: str,
+        exchange: Exchange,
+        interval: Interval,
+        tz: tzinfo = None,
+        gateway_name: str = "DB",
+        columns: Dict[str, np.ndarray] = None
+    ) -> None:
+        """"""
+        super().__init__(symbol, exchange, tz, gateway_name, columns)
+
+        self.interval: Interval = interval
+
+    def new(self, columns: Dict[str, np.ndarray]) -> "BarHistory":
+        """"""
+        return BarHistory(
+            self.symbol,
+            self.exchange,
+            self.interval,
+            self.tz,
+            self.gateway_name,
+            columns
+        )
+
+    def create_data(self, dt: datetime, values: Sequence) -> BarData:
+        """"""
+        volume, turnover, open_interest, open_price, high_price, low_price, close_price = values
+
+        return BarData(
+            symbol=self.symbol,
+            exchange=self.exchange,
+            datetime=dt,
+            interval=self.interval,
+            volume=volume,
+            turnover=turnover,
+            open_interest=open_interest,
+            open_price=open_price,
+            high_price=high_price,
+            low_price=low_price,
+            close_price=close_price,
+            gateway_name=self.gateway_name
+        )
+
+    @classmethod
+    def from_data(
+        cls,
+        bars: List[BarData],
+        symbol: str = "",
+        exchange: Exchange = None,
+        interval: Interval = None
+    ) -> "BarHistory":
+        """
+        Create bar history from list of bar data.
+        """
+        if not bars:
+            return BarHistory(symbol, exchange, interval)
+
+        bar: BarData = bars[0]
+
+        columns: Dict[str, np.ndarray] = {
+            "datetime": np.fromiter((to_timestamp(b.datetime) for b in bars), np.int64, len(bars))
+        }
+        for name in cls.fields:
+            columns[name] = np.fromiter((getattr(b, name) for b in bars), np.float64, len(bars))
+
+        return BarHistory(
+            bar.symbol,
+            bar.exchange,
+            bar.interval,
+            bar.datetime.tzinfo,
+            bar.gateway_name,
+            columns
+        )
+
+
+class TickHistory(BaseHistory):
+    """
+    Columnar container of tick data.
+    """
+
+    fields: tuple = (
+        "volume",
+        "turnover",
+        "open_interest",
+        "last_price",
+        "last_volume",
+        "limit_up",
+        "limit_down",
+        "open_price",
+        "high_price",
+        "low_price",
+        "pre_close",
+        "bid_price_1",
+        "bid_price_2",
+        "bid_price_3",
+        "bid_price_4",
+        "bid_price_5",
+        "ask_price_1",
+        "ask_price_2",
+        "ask_price_3",
+        "ask_price_4",
+        "ask_price_5",
+        "bid_volume_1",
+        "bid_volume_2",
+        "bid_volume_3",
+        "bid_volume_4",
+        "bid_volume_5",
+        "ask_volume_1",
+        "ask_volume_2",
+        "ask_volume_3",
+        "ask_volume_4",
+        "ask_volume_5",
+    )
+
+    def __init__(
+        self,
+        symbol: str,
+        exchange: Exchange,
+        name: str = "",
+        tz: tzinfo = None,
+        gateway_name: str = "DB",
+        columns: Dict[str, np.ndarray] = None
+    ) -> None:
+        """"""
+        super().__init__(symbol, exchange, tz, gateway_name, columns)
+
+        self.name: str = name
+
+    def new(self, columns: Dict[str, np.ndarray]) -> "TickHistory":
+        """"""
+        return TickHistory(
+            self.symbol,
+            self.exchange,
+            self.name,
+            self.tz,
+            self.gateway_name,
+            columns
+        )
+
+    def create_data(self, dt: datetime, values: Sequence) -> TickData:
+        """"""
+        tick: TickData = TickData(
+            symbol=self.symbol,
+            exchange=self.exchange,
+            datetime=dt,
+            name=self.name,
+            gateway_name=self.gateway_name
+        )
+
+        for name, value in zip(self.fields, values):
+            setattr(tick, name, value)
+
+        return tick
+
+    @classmethod
+    def from_data(
+        cls,
+        ticks: List[TickData],
+        symbol: str = "",
+        exchange: Exchange = None
+    ) -> "TickHistory":
+        """
+        Create tick history from list of tick data.
+        """
+        if not ticks:
+            return TickHistory(symbol, exchange)
+
+        tick: TickData = ticks[0]
+
+        columns: Dict[str, np.ndarray] = {
+            "datetime": np.fromiter((to_timestamp(t.datetime) for t in ticks), np.int64, len(ticks))
+        }
+        for name in cls.fields:
+            columns[name] = np.fromiter(
+                (getattr(t, name) or 0 for t in ticks), np.float64, len(ticks)
+            )
+
+        return TickHistory(
+            tick.symbol,
+            tick.exchange,
+            tick.name,
+            tick.datetime.tzinfo,
+            tick.gateway_name,
+            columns
+        )
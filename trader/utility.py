@@ -5,9 +5,10 @@ General utility functions.
 import json
 import logging
 import sys
+from collections import OrderedDict
 from datetime import datetime, time
 from pathlib import Path
-from typing import Callable, Dict, Tuple, Union, Optional
+from typing import Callable, Dict, List, Tuple, Union, Optional
 from decimal import Decimal
 from math import floor, ceil
 
@@ -81,7 +82,7 @@ def get_folder_path(folder_name: str) -> Path:
     """
     folder_path: Path = TEMP_DIR.joinpath(folder_name)
     if not folder_path.exists():
-        folder_path.mkdir()
+        folder_path.mkdir(exist_ok=True)
     return folder_path
 
 
@@ -483,6 +484,109 @@ class BarGenerator:
         return bar
 
 
+class IndicatorCache:
+    """
+    Cache of indicator series calculated over full source history.
+
+    Series are keyed by (source fingerprint, indicator name, parameters).
+    ArrayManager fed with bars of the source history in order slices the
+    series at current bar instead of recalculating the indicator on every
+    bar. Least recently used series are evicted when total size exceeds
+    max_size bytes.
+    """
+
+    def __init__(self, max_size: int = 256 * 1024 ** 2) -> None:
+        """"""
+        self.max_size: int = max_size
+        self.total_size: int = 0
+        self.data: OrderedDict = OrderedDict()
+
+        self.fingerprint: str = ""
+        self.columns: Dict[str, np.ndarray] = {}
+        self.length: int = 0
+
+    def set_source(self, fingerprint: str, columns: Dict[str, np.ndarray]) -> None:
+        """
+        Set source history with open/high/low/close/volume/turnover/open_interest columns.
+        """
+        self.fingerprint = fingerprint
+        self.columns = columns
+        self.length = len(columns["close"])
+
+    def clear_source(self) -> None:
+        """"""
+        self.fingerprint = ""
+        self.columns = {}
+        self.length = 0
+
+    def match(self, fingerprint: str, ix: int, bar: BarData) -> Optional[int]:
+        """
+        Return ix if bar is row ix of source history. -1 is returned while
+        waiting for first row, None once bars no longer follow source.
+        """
+        if not fingerprint or fingerprint != self.fingerprint or ix >= self.length:
+            return None
+
+        columns: Dict[str, np.ndarray] = self.columns
+        if (
+            columns["close"][ix] == bar.close_price
+            and columns["high"][ix] == bar.high_price
+            and columns["low"][ix] == bar.low_price
+            and columns["volume"][ix] == bar.volume
+        ):
+            return ix
+
+        if not ix:
+            return -1
+        return None
+
+    def get(
+        self,
+        name: str,
+        params: tuple,
+        func: Callable,
+        fields: Tuple[str, ...]
+    ) -> Union[np.ndarray, Tuple[np.ndarray, ...]]:
+        """
+        Return indicator series of source history, calculate it if not cached.
+        """
+        key: tuple = (self.fingerprint, name, params)
+
+        series: Union[np.ndarray, tuple] = self.data.get(key, None)
+        if series is not None:
+            self.data.move_to_end(key)
+            return series
+
+        series = func(*[self.columns[field] for field in fields], *params)
+
+        arrays: tuple = series if isinstance(series, tuple) else (series,)
+        size: int = sum(a.nbytes for a in arrays)
+        if size > self.max_size:
+            return series
+
+        # Cached series is shared by all array managers, so make it read only
+        for a in arrays:
+            a.flags.writeable = False
+
+        self.data[key] = series
+        self.total_size += size
+
+        while self.total_size > self.max_size:
+            _, evicted = self.data.popitem(last=False)
+            evicted = evicted if isinstance(evicted, tuple) else (evicted,)
+            self.total_size -= sum(a.nbytes for a in evicted)
+
+        return series
+
+    def clear(self) -> None:
+        """"""
+        self.data.clear()
+        self.total_size = 0
+
+
+indicator_cache: IndicatorCache = IndicatorCache()
+
+
 class ArrayManager(object):
     """
     For:
@@ -504,6 +608,9 @@ class ArrayManager(object):
         self.turnover_array: np.ndarray = np.zeros(size)
         self.open_interest_array: np.ndarray = np.zeros(size)
 
+        self.source_fingerprint: str = ""
+        self.source_ix: Optional[int] = None
+
     def update_bar(self, bar: BarData) -> None:
         """
         Update new bar data into array manager.
@@ -528,6 +635,56 @@ class ArrayManager(object):
         self.turnover_array[-1] = bar.turnover
         self.open_interest_array[-1] = bar.open_interest
 
+        # Follow position of bar in source history of indicator cache
+        if self.count == 1:
+            self.source_fingerprint = indicator_cache.fingerprint
+            self.source_ix = -1
+
+        if self.source_ix is not None:
+            self.source_ix = indicator_cache.match(
+                self.source_fingerprint,
+                self.source_ix + 1,
+                bar
+            )
+
+    def calculate(
+        self,
+        name: str,
+        func: Callable,
+        fields: Tuple[str, ...],
+        params: tuple,
+        lookback: int
+    ) -> Union[np.ndarray, Tuple[np.ndarray, ...]]:
+        """
+        Calculate indicator over time series of fields.
+
+        Only for indicators whose every value is an exact function of last
+        lookback + 1 inputs, without running sums (talib SMA, STDDEV and the
+        like accumulate rounding error along the series, so a slice of the
+        full history series would differ from the window calculation). If
+        the array window is fully inside source history of indicator cache,
+        the cached full history series is sliced instead, with leading values
+        before warm up set to nan same as calculating over the window.
+        """
+        ix: Optional[int] = self.source_ix
+        if ix is not None and ix + 1 >= self.size and lookback < self.size:
+            series: Union[np.ndarray, tuple] = indicator_cache.get(name, params, func, fields)
+
+            start: int = ix + 1 - self.size
+            arrays: tuple = series if isinstance(series, tuple) else (series,)
+
+            results: List[np.ndarray] = []
+            for s in arrays:
+                result: np.ndarray = s[start: ix + 1].copy()
+                result[:lookback] = np.nan
+                results.append(result)
+
+            if isinstance(series, tuple):
+                return tuple(results)
+            return results[0]
+
+        return func(*[getattr(self, field) for field in fields], *params)
+
     @property
     def open(self) -> np.ndarray:
         """
@@ -641,7 +798,7 @@ class ArrayManager(object):
         """
         MOM.
         """
-        result: np.ndarray = talib.MOM(self.close, n)
+        result: np.ndarray = self.calculate("mom", talib.MOM, ("close",), (n,), n)
         if array:
             return result
         return result[-1]
@@ -665,7 +822,7 @@ class ArrayManager(object):
         """
         ROC.
         """
-        result: np.ndarray = talib.ROC(self.close, n)
+        result: np.ndarray = self.calculate("roc", talib.ROC, ("close",), (n,), n)
         if array:
             return result
         return result[-1]
@@ -674,7 +831,7 @@ class ArrayManager(object):
         """
         ROCR.
         """
-        result: np.ndarray = talib.ROCR(self.close, n)
+        result: np.ndarray = self.calculate("rocr", talib.ROCR, ("close",), (n,), n)
         if array:
             return result
         return result[-1]
@@ -683,7 +840,7 @@ class ArrayManager(object):
         """
         ROCP.
         """
-        result: np.ndarray = talib.ROCP(self.close, n)
+        result: np.ndarray = self.calculate("rocp", talib.ROCP, ("close",), (n,), n)
         if array:
             return result
         return result[-1]
@@ -829,7 +986,7 @@ class ArrayManager(object):
         """
         WILLR.
         """
-        result: np.ndarray = talib.WILLR(self.high, self.low, self.close, n)
+        result: np.ndarray = self.calculate("willr", talib.WILLR, ("high", "low", "close"), (n,), n - 1)
         if array:
             return result
         return result[-1]
@@ -907,8 +1064,8 @@ class ArrayManager(object):
         """
         Donchian Channel.
         """
-        up: np.ndarray = talib.MAX(self.high, n)
-        down: np.ndarray = talib.MIN(self.low, n)
+        up: np.ndarray = self.calculate("max", talib.MAX, ("high",), (n,), n - 1)
+        down: np.ndarray = self.calculate("min", talib.MIN, ("low",), (n,), n - 1)
 
         if array:
             return up, down
@@ -925,7 +1082,7 @@ class ArrayManager(object):
         """
         Aroon indicator.
         """
-        aroon_down, aroon_up = talib.AROON(self.high, self.low, n)
+        aroon_down, aroon_up = self.calculate("aroon", talib.AROON, ("high", "low"), (n,), n)
 
         if array:
             return aroon_up, aroon_down
@@ -935,7 +1092,7 @@ class ArrayManager(object):
         """
         Aroon Oscillator.
         """
-        result: np.ndarray = talib.AROONOSC(self.high, self.low, n)
+        result: np.ndarray = self.calculate("aroonosc", talib.AROONOSC, ("high", "low"), (n,), n)
 
         if array:
             return result